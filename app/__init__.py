@@ -2,8 +2,9 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from app.config import Config
+from app.replicas import RoutingSession, replica_router
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 
 def create_app():
@@ -12,8 +13,27 @@ def create_app():
 
     db.init_app(app)
     migrate.init_app(app, db)
+    replica_router.init_app(app)
+
+    from app.cache import entity_cache
+    entity_cache.init_app(app)
+
+    from app.storage import storage_service
+    storage_service.init_app(app)
+
+    from app.thumbnails import thumbnails
+    thumbnails.init_app(app)
+
+    from app.draw_state import draw_state
+    draw_state.init_app(app)
+
+    from app.jobs import job_queue
+    job_queue.init_app(app)
 
     from app.routes import register_routes
     register_routes(app)
 
+    from app.cli import register_commands
+    register_commands(app)
+
     return app
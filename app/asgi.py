@@ -0,0 +1,84 @@
+"""ASGI entry point, served with `uvicorn app.asgi:app`.
+
+Draws are handled by async views on an asyncpg engine, so a worker is not
+held while they wait on Postgres. Every other route is passed through to the
+Flask app, which runs on a pool of ASGI_WSGI_THREADS threads.
+
+Async draws write drawn_card directly, so only the postgres draw state
+backend can be used here.
+"""
+import json
+from types import SimpleNamespace
+from uuid import UUID
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from app import create_app
+from app.replicas import replica_router
+from app.draws import draw_cards_async
+from app.models import Card, Deck
+from app.routes.card_routes import MAX_DRAW_COUNT
+from app.serializers import serialize_card, orjson
+
+flask_app = create_app()
+if flask_app.config['DRAW_STATE_BACKEND'] != 'postgres':
+    # The bitmaps of the Flask app would never see the async draws and hand the same cards out again
+    raise RuntimeError("The ASGI entry point requires DRAW_STATE_BACKEND=postgres")
+engine = create_async_engine(flask_app.config['ASYNC_DATABASE_URI'], **flask_app.config['ASYNC_ENGINE_OPTIONS'])
+
+def _json(payload, status_code=200):
+    if orjson is not None:
+        body = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    else:
+        body = json.dumps(payload, sort_keys=True)
+    return Response(body, status_code=status_code, media_type='application/json')
+
+async def _no_card_error(connection, deck_id):
+    deck_title = (await connection.execute(select(Deck.title).where(Deck.id == deck_id))).scalar()
+    if deck_title is None:
+        return _json({"error": f"Deck with id {deck_id} does not exist"}, 404)
+
+    has_cards = (await connection.execute(select(select(Card.id).where(Card.deck_id == deck_id).exists()))).scalar()
+    if not has_cards:
+        return _json({"error": f"No cards available in deck with id {deck_id}"}, 404)
+
+    return _json({"error": f"There are no more cards to be drawn in the Deck: {deck_title}"}, 404)
+
+async def get_random_card(request):
+    """Async variant of GET /cards/random/<deck_id>, with the same responses."""
+    deck_id = request.path_params['deck_id']
+    try:
+        deck_id = UUID(deck_id)
+    except ValueError:
+        return _json({"error": f"Deck with id {deck_id} does not exist"}, 404)
+
+    count = request.query_params.get('count')
+    if count is not None:
+        try:
+            count = int(count)
+        except ValueError:
+            return _json({"error": "count must be an integer"}, 400)
+        if not 1 <= count <= MAX_DRAW_COUNT:
+            return _json({"error": f"count must be between 1 and {MAX_DRAW_COUNT}"}, 400)
+
+    async with engine.begin() as connection:
+        rows = await draw_cards_async(connection, deck_id, count or 1)
+        if not rows:
+            return await _no_card_error(connection, deck_id)
+
+    # Presigning is local CPU work once the storage region is configured
+    size = request.query_params.get('size') or ''
+    with flask_app.app_context():
+        cards = [serialize_card(SimpleNamespace(**row), size) for row in rows]
+
+    # Drawing wrote to the primary, as in the Flask app later reads of this client must see it
+    return replica_router.pin(_json(cards[0] if count is None else cards))
+
+app = Starlette(routes=[
+    Route('/cards/random/{deck_id}', get_random_card, methods=['GET']),
+    # Unlike asgiref's WsgiToAsgi, which runs every request on one shared thread
+    Mount('/', app=WSGIMiddleware(flask_app, workers=flask_app.config['ASGI_WSGI_THREADS']))
+])
@@ -0,0 +1,156 @@
+import enum
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from types import SimpleNamespace
+from uuid import UUID
+import sqlalchemy as sa
+from sqlalchemy import inspect
+from app import db
+from app.replicas import primary
+
+class MemoryBackend:
+    """Bounded in-process LRU. Writes in other processes only reach it through the TTL."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry or entry[1] <= time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def size(self):
+        return len(self._entries)
+
+class RedisBackend:
+    """Cache shared by every process through any client speaking the Redis protocol."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key):
+        # JSON only, unpickling what a shared server returns would run any code written there
+        data = self.client.get(key)
+        return json.loads(data) if data is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(key, json.dumps(value), ex=ttl)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def size(self):
+        return None
+
+def _to_json(value):
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+def _from_json(column_type, value):
+    if value is None:
+        return None
+    if isinstance(column_type, sa.Uuid):
+        return UUID(value)
+    if isinstance(column_type, sa.DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column_type, sa.Enum) and column_type.enum_class:
+        return column_type.enum_class(value)
+    return value
+
+class EntityCache:
+    """Read-through cache of single decks and cards, keyed by model and id.
+
+    Entities are cached as detached snapshots of their columns, encoded as
+    plain JSON values whatever the backend. Write handlers must call invalidate
+    after committing a change, and check what they write against the database
+    rather than through the cache.
+    """
+
+    def __init__(self):
+        self._backend = None
+        self._ttl = None
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self._ttl = app.config['ENTITY_CACHE_TTL']
+        if app.config['ENTITY_CACHE_BACKEND'] == 'redis':
+            import redis  # Only needed for the shared backend
+            self._backend = RedisBackend(redis.Redis.from_url(app.config['ENTITY_CACHE_REDIS_URL']))
+        else:
+            self._backend = MemoryBackend(app.config['ENTITY_CACHE_SIZE'])
+
+    @staticmethod
+    def _key(model, entity_id):
+        return f"{model.__tablename__}:{entity_id}"
+
+    def get(self, model, entity_id):
+        """Return a snapshot of the entity with its column values as attributes, or None."""
+        try:
+            entity_id = UUID(str(entity_id))
+        except ValueError:
+            return None
+
+        key = self._key(model, entity_id)
+        data = self._backend.get(key)
+        if data is not None:
+            self.hits += 1
+            return self._snapshot(model, data)
+
+        self.misses += 1
+        # Filled from the primary, a lagging replica would keep stale entries alive
+        with primary():
+            entity = db.session.get(model, entity_id)
+        if entity is None:
+            return None
+        data = {attr.key: _to_json(getattr(entity, attr.key)) for attr in self._columns(model)}
+        self._backend.set(key, data, self._ttl)
+        return self._snapshot(model, data)
+
+    @staticmethod
+    def _columns(model):
+        return [attr for attr in inspect(model).column_attrs if not attr.deferred]
+
+    def _snapshot(self, model, data):
+        return SimpleNamespace(**{
+            attr.key: _from_json(attr.columns[0].type, data.get(attr.key)) for attr in self._columns(model)
+        })
+
+    def invalidate(self, model, entity_id):
+        if entity_id is not None:
+            self._backend.delete(self._key(model, UUID(str(entity_id))))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": self._backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None
+        }
+
+entity_cache = EntityCache()
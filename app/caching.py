@@ -0,0 +1,46 @@
+import hashlib
+import time
+from flask import current_app, request
+from app.storage import StorageService
+
+# Presigned URLs are re-signed once they get within URL_REFRESH_MARGIN of
+# their expiry, so every URL handed out is still valid for at least that
+# long. Card responses are cached for the rest of the current window only.
+URL_WINDOW = int(StorageService.URL_REFRESH_MARGIN.total_seconds())
+
+def make_etag(*parts):
+    """ETag of the values a response is built from."""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def url_window():
+    """Index of the current presigned URL window, part of the ETag of responses carrying URLs."""
+    return int(time.time()) // URL_WINDOW
+
+def _url_window_max_age():
+    return URL_WINDOW - int(time.time()) % URL_WINDOW
+
+def conditional_response(etag, build, signed_urls=False):
+    """Return 304 if the client already has etag, otherwise the response made by build().
+
+    Responses with presigned URLs may be cached privately until the current URL
+    window ends; others must always be revalidated. Their ETags are weak, the
+    URLs inside can be signed differently by each worker or re-signed within a
+    window, so equal ETags only mean equivalent bodies.
+    """
+    # If-None-Match always uses the weak comparison
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = build()
+
+    response.set_etag(etag, weak=signed_urls)
+    if signed_urls:
+        response.cache_control.private = True
+        response.cache_control.max_age = _url_window_max_age()
+    else:
+        response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,49 @@
+import click
+from app import draws
+from app.image_gc import collect_orphans
+from app.storage import storage_service
+
+def register_commands(app):
+    @app.cli.command('explain-draws')
+    @click.argument('deck_id')
+    def explain_draws(deck_id):
+        """Print the query plans of the draw and reset statements for a deck."""
+        for name, plan in draws.explain(deck_id).items():
+            click.echo(f"== {name}")
+            for line in plan:
+                click.echo(line)
+
+            used = [index for index in ('ix_drawn_card_deck_id_undrawn', 'ix_drawn_card_deck_id_due_at',
+                                        'ix_drawn_card_card_id', 'card_pkey')
+                    if any(index in line for line in plan)]
+            click.echo(f"indexes used: {', '.join(used) or 'none'}")
+            click.echo()
+
+    @app.cli.command('init-storage')
+    def init_storage():
+        """Create the image bucket, once per deployment."""
+        storage_service.init_bucket()
+        click.echo(f"Bucket {storage_service.bucket_name} is ready")
+
+    @app.cli.command('gc-images')
+    @click.option('--dry-run', is_flag=True, help="Report the orphaned objects without deleting them.")
+    @click.option('--grace-seconds', type=int, default=None,
+                  help="Keep objects younger than this. Defaults to IMAGE_GC_GRACE_SECONDS.")
+    @click.option('--batch-size', type=int, default=None,
+                  help="Keys checked per query. Defaults to IMAGE_GC_BATCH_SIZE.")
+    def gc_images(dry_run, grace_seconds, batch_size):
+        """Delete the image objects that no card references anymore."""
+        if grace_seconds is None:
+            grace_seconds = app.config['IMAGE_GC_GRACE_SECONDS']
+        if batch_size is None:
+            batch_size = app.config['IMAGE_GC_BATCH_SIZE']
+
+        def report(result):
+            stats = result.to_dict()
+            click.echo(f"scanned {stats['scanned']} objects, {stats['orphaned']} orphaned, "
+                       f"{stats['deleted']} deleted ({stats['objects_per_second']} objects/s)")
+
+        result = collect_orphans(grace_seconds, batch_size, dry_run=dry_run, on_batch=report)
+        click.echo(f"== {'dry run' if dry_run else 'done'}")
+        for name, value in result.to_dict().items():
+            click.echo(f"{name}: {value}")
@@ -0,0 +1,94 @@
+import time
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from app.models import Card, Deck, DrawnCard
+from app.storage import storage_service
+from app.cache import entity_cache
+from app.draw_state import draw_state
+
+LOCKED_RETRY_DELAY = 0.1
+MAX_LOCKED_RETRY_DELAY = 5
+
+class DeletionResult:
+    """Progress of a deck deletion."""
+
+    def __init__(self):
+        self.cards_deleted = 0
+        self.objects_deleted = 0
+        self.object_errors = 0
+
+    def to_dict(self):
+        return {
+            "cards_deleted": self.cards_deleted,
+            "objects_deleted": self.objects_deleted,
+            "object_errors": self.object_errors
+        }
+
+def _remove_images(rows, result):
+    object_names = [name for row in rows for name in (row.front_img, row.back_img) if name]
+    if not object_names:
+        return
+    try:
+        errors = storage_service.remove_files(object_names)
+    except Exception as e:
+        # The cards are gone already, leftover objects are removed by `flask gc-images`
+        current_app.logger.error(f"Error deleting card images: {str(e)}")
+        errors = len(object_names)
+    result.objects_deleted += len(object_names) - errors
+    result.object_errors += errors
+
+def delete_cards(card_ids):
+    """Delete cards and their draw state with set-based statements. The caller commits."""
+    db.session.execute(DrawnCard.__table__.delete().where(DrawnCard.card_id.in_(card_ids)))
+    db.session.execute(Card.__table__.delete().where(Card.id.in_(card_ids)))
+
+def _delete_chunk(deck_id, chunk_size):
+    # SKIP LOCKED leaves cards busy in a draw to a later chunk
+    rows = db.session.execute(
+        select(Card.id, Card.front_img, Card.back_img)
+        .where(Card.deck_id == deck_id)
+        .limit(chunk_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if rows:
+        delete_cards([row.id for row in rows])
+    db.session.commit()
+    return rows
+
+def delete_deck_in_chunks(deck_id, chunk_size, result, on_chunk=None):
+    """Delete a deck with its cards, draw state and images.
+
+    Cards are deleted chunk_size at a time, each chunk in its own short
+    transaction, and their images removed with bulk requests once the chunk
+    is committed. result is updated, and on_chunk called, as chunks complete.
+    """
+    delay = LOCKED_RETRY_DELAY
+    while True:
+        rows = _delete_chunk(deck_id, chunk_size)
+        if rows:
+            delay = LOCKED_RETRY_DELAY
+            result.cards_deleted += len(rows)
+            for row in rows:
+                entity_cache.invalidate(Card, row.id)
+            _remove_images(rows, result)
+            if on_chunk:
+                on_chunk()
+            continue
+
+        # Lock the deck so no card can be added to it, then delete it if empty
+        db.session.execute(select(Deck.id).where(Deck.id == deck_id).with_for_update())
+        if db.session.query(Card.query.filter_by(deck_id=deck_id).exists()).scalar():
+            # Only cards locked by a draw or a review are left, wait for them to be released
+            db.session.rollback()
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_LOCKED_RETRY_DELAY)
+            continue
+
+        db.session.execute(DrawnCard.__table__.delete().where(DrawnCard.deck_id == deck_id))
+        db.session.execute(Deck.__table__.delete().where(Deck.id == deck_id))
+        db.session.commit()
+        break
+
+    entity_cache.invalidate(Deck, deck_id)
+    draw_state.invalidate(deck_id)
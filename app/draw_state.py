@@ -0,0 +1,302 @@
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert
+from app import db
+from app.models import Card, DrawnCard
+from app.draws import draw_cards, reset_deck
+from app.serializers import CARD_COLUMNS
+
+RANDOM_PROBES = 8
+FLUSH_BATCH_SIZE = 1000
+WRITE_RETRY_DELAY = 0.5
+MAX_WRITE_RETRY_DELAY = 30
+
+class PostgresDrawState:
+    """Draw state kept only in the drawn_card table."""
+
+    def draw(self, deck_id, count):
+        cards = draw_cards(deck_id, count)
+        db.session.commit()
+        return cards
+
+    def reset(self, deck_id):
+        count = reset_deck(deck_id)
+        db.session.commit()
+        return count
+
+    def invalidate(self, deck_id):
+        pass
+
+    def invalidate_all(self):
+        pass
+
+class DeckBitmap:
+    """Drawn flags of a deck, one bit per card ordinal.
+
+    Ordinals follow the (created_at, id) order of the cards at load time. The
+    padding bits of the last byte are kept set so they are never drawn.
+    """
+
+    def __init__(self, deck_id, card_ids, drawn_ids):
+        self.deck_id = deck_id
+        self.card_ids = card_ids
+        self.clear()
+        for ordinal, card_id in enumerate(card_ids):
+            if card_id in drawn_ids:
+                self._set(ordinal)
+
+    def clear(self):
+        size = len(self.card_ids)
+        self.bits = bytearray((size + 7) // 8)
+        for ordinal in range(size, len(self.bits) * 8):
+            self.bits[ordinal >> 3] |= 1 << (ordinal & 7)
+        self.remaining = size
+
+    def _is_set(self, ordinal):
+        return self.bits[ordinal >> 3] & (1 << (ordinal & 7))
+
+    def _set(self, ordinal):
+        self.bits[ordinal >> 3] |= 1 << (ordinal & 7)
+        self.remaining -= 1
+
+    def _find_unset(self, start):
+        # Only reached once the deck is mostly drawn: scan bytes from a random
+        # position for one that still has a clear bit
+        count = len(self.bits)
+        for step in range(count):
+            index = (start + step) % count
+            byte = self.bits[index]
+            if byte != 0xFF:
+                return index * 8 + ((~byte & (byte + 1)).bit_length() - 1)
+
+    def draw(self):
+        """Set a random clear bit and return the card id it stands for, or None."""
+        if not self.remaining:
+            return None
+
+        for _ in range(RANDOM_PROBES):
+            ordinal = random.randrange(len(self.card_ids))
+            if not self._is_set(ordinal):
+                break
+        else:
+            ordinal = self._find_unset(random.randrange(len(self.bits)))
+
+        self._set(ordinal)
+        return self.card_ids[ordinal]
+
+class BitmapDrawState:
+    """Draw state held in process memory as one bitmap per deck.
+
+    Bitmaps are loaded from drawn_card on first use, draws and resets only
+    flip bits and are written behind to Postgres by a background thread. The
+    bitmaps are private to the process, so this backend must only be used
+    when a single process serves the draw endpoints. At most max_decks
+    bitmaps are kept, the least recently used one is dropped first.
+    """
+
+    def __init__(self, app, max_decks):
+        self._app = app
+        self._max_decks = max_decks
+        self._decks = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by invalidations, a bitmap loaded across one may be stale
+        self._generation = 0
+        self._pending = queue.Queue()
+        # Operations are numbered as they are queued, and written in that order
+        self._queued = 0
+        self._written = 0
+        self._written_changed = threading.Condition()
+        threading.Thread(target=self._write_behind, name='draw-state-writer', daemon=True).start()
+
+    def _load(self, deck_id):
+        rows = db.session.execute(
+            select(Card.id, DrawnCard.is_drawn)
+            .outerjoin(DrawnCard, DrawnCard.card_id == Card.id)
+            .where(Card.deck_id == deck_id)
+            .order_by(Card.created_at, Card.id)
+        ).all()
+        return DeckBitmap(deck_id, [row.id for row in rows], {row.id for row in rows if row.is_drawn})
+
+    @contextmanager
+    def _bitmap(self, deck_id):
+        """Yield the bitmap of a deck with the lock held, loading it first if needed."""
+        deck_id = uuid.UUID(str(deck_id))
+        while True:
+            with self._lock:
+                bitmap = self._decks.get(deck_id)
+                if bitmap is not None:
+                    self._decks.move_to_end(deck_id)
+                    yield bitmap
+                    return
+                generation = self._generation
+
+            # Loaded without the lock, so draws of other decks go on meanwhile.
+            # Queued writes must land first, drawn_card would miss them otherwise.
+            self._wait_written()
+            bitmap = self._load(deck_id)
+
+            with self._lock:
+                if generation != self._generation or deck_id in self._decks:
+                    continue
+                # Empty or missing decks are not kept, so unknown ids cannot fill memory
+                if bitmap.card_ids:
+                    self._decks[deck_id] = bitmap
+                    while len(self._decks) > self._max_decks:
+                        self._decks.popitem(last=False)
+                yield bitmap
+                return
+
+    def _enqueue(self, op):
+        # Called with the lock held, which keeps numbers in queue order
+        self._queued += 1
+        self._pending.put(op)
+
+    def _wait_written(self):
+        """Wait until the operations queued so far are written, ignoring later ones."""
+        with self._lock:
+            target = self._queued
+        with self._written_changed:
+            self._written_changed.wait_for(lambda: self._written >= target)
+
+    def draw(self, deck_id, count):
+        card_ids = []
+        with self._bitmap(deck_id) as bitmap:
+            for _ in range(count):
+                card_id = bitmap.draw()
+                if not card_id:
+                    break
+                card_ids.append(card_id)
+                self._enqueue(('draw', (card_id, bitmap.deck_id)))
+        if not card_ids:
+            return []
+        cards = {card.id: card for card in db.session.query(*CARD_COLUMNS).filter(Card.id.in_(card_ids))}
+        return [cards[card_id] for card_id in card_ids if card_id in cards]
+
+    def reset(self, deck_id):
+        with self._bitmap(deck_id) as bitmap:
+            # Same count as the postgres backend: the cards that were drawn
+            reset_count = len(bitmap.card_ids) - bitmap.remaining
+            bitmap.clear()
+            self._enqueue(('reset', bitmap.deck_id))
+        return reset_count
+
+    def invalidate(self, deck_id):
+        """Forget the bitmap of a deck after its cards changed."""
+        if deck_id is None:
+            return
+        # Let pending writes land first, the bitmap is reloaded from drawn_card
+        self._wait_written()
+        with self._lock:
+            self._decks.pop(uuid.UUID(str(deck_id)), None)
+            self._generation += 1
+
+    def invalidate_all(self):
+        """Forget every bitmap, when the cards of unknown decks changed."""
+        self._wait_written()
+        with self._lock:
+            self._decks.clear()
+            self._generation += 1
+
+    def _flush_draws(self, draws):
+        stmt = insert(DrawnCard).values([
+            {'id': uuid.uuid4(), 'card_id': card_id, 'deck_id': deck_id, 'is_drawn': True}
+            for card_id, deck_id in draws
+        ])
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['card_id'],
+            set_={'is_drawn': True, 'updated_at': db.func.now()}
+        ))
+
+    def _apply(self, ops):
+        # Apply operations in order, batching consecutive draws
+        drawn = []
+        for kind, target_id in ops:
+            if kind == 'draw':
+                drawn.append(target_id)
+                continue
+            if drawn:
+                self._flush_draws(drawn)
+                drawn = []
+            reset_deck(target_id)
+        if drawn:
+            self._flush_draws(drawn)
+        db.session.commit()
+
+    def _write(self, ops):
+        delay = WRITE_RETRY_DELAY
+        while True:
+            try:
+                self._apply(ops)
+                return
+            except IntegrityError as e:
+                db.session.rollback()
+                self._app.logger.error(f"Error writing draw state, retrying operations one by one: {str(e)}")
+                break
+            except Exception as e:
+                # Most likely Postgres is unreachable, the draws must not be lost
+                db.session.rollback()
+                self._app.logger.error(f"Error writing draw state, retrying in {delay}s: {str(e)}")
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_WRITE_RETRY_DELAY)
+
+        # A card deleted since it was drawn fails the whole batch, only drop the
+        # operations that cannot be written on their own
+        for op in ops:
+            try:
+                self._apply([op])
+            except Exception as e:
+                db.session.rollback()
+                self._app.logger.error(f"Dropping draw state operation {op}: {str(e)}")
+
+    def _write_behind(self):
+        while True:
+            ops = [self._pending.get()]
+            while len(ops) < FLUSH_BATCH_SIZE:
+                try:
+                    ops.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+
+            with self._app.app_context():
+                self._write(ops)
+
+            with self._written_changed:
+                self._written += len(ops)
+                self._written_changed.notify_all()
+
+class DrawState:
+    """Draw backend selected by the DRAW_STATE_BACKEND setting."""
+
+    def __init__(self):
+        self._backend = None
+
+    def init_app(self, app):
+        if app.config['DRAW_STATE_BACKEND'] == 'bitmap':
+            self._backend = BitmapDrawState(app, app.config['DRAW_STATE_MAX_DECKS'])
+        else:
+            self._backend = PostgresDrawState()
+
+    def draw(self, deck_id, count=1):
+        """Draw up to count distinct undrawn cards of the deck, in random order."""
+        return self._backend.draw(deck_id, count)
+
+    def reset(self, deck_id):
+        """Mark every card of the deck as undrawn and return how many were reset."""
+        return self._backend.reset(deck_id)
+
+    def invalidate(self, deck_id):
+        """Signal that the cards of a deck changed. A None deck_id is ignored."""
+        self._backend.invalidate(deck_id)
+
+    def invalidate_all(self):
+        """Signal that the cards of any deck may have changed."""
+        self._backend.invalidate_all()
+
+draw_state = DrawState()
@@ -0,0 +1,109 @@
+from uuid import UUID
+from sqlalchemy import text
+from app import db
+
+# Picks random undrawn cards of the deck and marks them as drawn in a single statement.
+# Every card has its drawn_card row, so undrawn cards are read from the partial
+# ix_drawn_card_deck_id_undrawn index without touching the card table.
+_DRAW_SQL = text("""
+    WITH picked AS (
+        SELECT card_id
+        FROM drawn_card
+        WHERE deck_id = :deck_id
+          AND NOT is_drawn
+        ORDER BY random()
+        LIMIT :count
+    ),
+    marked AS (
+        UPDATE drawn_card
+        SET is_drawn = true, updated_at = now()
+        FROM picked
+        WHERE drawn_card.card_id = picked.card_id
+    )
+    SELECT card.id, card.front, card.back, card.front_img, card.back_img,
+           card.front_img_hash, card.back_img_hash, card.deck_id, card.created_at, card.updated_at
+    FROM card
+    JOIN picked ON picked.card_id = card.id
+""")
+
+# Clears the draw state of every card in the deck, creating the missing
+# DrawnCard rows so that later draws only ever have to update.
+_RESET_SQL = text("""
+    UPDATE drawn_card
+    SET is_drawn = false, updated_at = now()
+    WHERE deck_id = :deck_id
+      AND is_drawn
+""")
+
+_INSERT_MISSING_SQL = text("""
+    INSERT INTO drawn_card (id, card_id, deck_id, is_drawn, created_at, updated_at)
+    SELECT gen_random_uuid(), card.id, card.deck_id, false, now(), now()
+    FROM card
+    WHERE card.deck_id = :deck_id
+      AND NOT EXISTS (SELECT 1 FROM drawn_card WHERE drawn_card.card_id = card.id)
+    ON CONFLICT (card_id) DO NOTHING
+""")
+
+_LOCK_DECK_SQL = text("SELECT pg_advisory_xact_lock(hashtext(:deck_id))")
+
+def _lock_key(deck_id):
+    # Postgres accepts many spellings of a UUID, the lock must not depend on which one was sent
+    return str(UUID(str(deck_id)))
+
+def lock_deck(deck_id):
+    """Serialize draw state changes of a deck until the current transaction ends.
+
+    Raises ValueError when deck_id is not a UUID.
+    """
+    db.session.execute(_LOCK_DECK_SQL, {"deck_id": _lock_key(deck_id)})
+
+def draw_cards(deck_id, count=1):
+    """Draw up to count distinct random undrawn cards from the deck and mark them as drawn.
+
+    Returns the drawn cards as rows of their columns, which is empty when every
+    card of the deck has been drawn (or the deck has no cards). Rows are not
+    tied to the session, so they can be serialized after the caller commits
+    without a query per card.
+    """
+    # The deck lock makes the draw statement run on a snapshot that already
+    # sees every concurrent draw, so the same card is never returned twice.
+    lock_deck(deck_id)
+    return db.session.execute(_DRAW_SQL, {"deck_id": str(deck_id), "count": count}).all()
+
+async def draw_cards_async(connection, deck_id, count=1):
+    """Same as draw_cards on an AsyncConnection, returning the card rows as mappings.
+
+    Must run inside a transaction of connection; the caller commits it.
+    """
+    params = {"deck_id": _lock_key(deck_id)}
+    await connection.execute(_LOCK_DECK_SQL, params)
+    result = await connection.execute(_DRAW_SQL, {**params, "count": count})
+    return result.mappings().all()
+
+def reset_deck(deck_id):
+    """Mark every card of the deck as undrawn.
+
+    Returns the number of DrawnCard rows updated or inserted. The caller is
+    responsible for committing.
+    """
+    lock_deck(deck_id)
+    params = {"deck_id": str(deck_id)}
+    updated = db.session.execute(_RESET_SQL, params).rowcount
+    inserted = db.session.execute(_INSERT_MISSING_SQL, params).rowcount
+    return updated + inserted
+
+def explain(deck_id):
+    """Return the EXPLAIN ANALYZE plans of the draw and reset statements for a deck.
+
+    The statements run inside a transaction that is rolled back, so the draw
+    state of the deck is left untouched.
+    """
+    params = {"deck_id": str(deck_id), "count": 1}
+    plans = {}
+    try:
+        for name, stmt in (("draw", _DRAW_SQL), ("reset", _RESET_SQL), ("insert_missing", _INSERT_MISSING_SQL)):
+            explained = text(f"EXPLAIN (ANALYZE, BUFFERS) {stmt.text}")
+            plans[name] = [row[0] for row in db.session.execute(explained, params)]
+    finally:
+        db.session.rollback()
+    return plans
@@ -0,0 +1,46 @@
+import csv
+import enum
+import io
+from flask import Response, current_app, stream_with_context
+from app import db
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+def _partitions(stmt):
+    # yield_per makes psycopg2 use a server-side cursor, so rows are fetched
+    # from the database one batch at a time
+    result = db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    return result.mappings().partitions()
+
+def _plain(row):
+    # Enum columns such as Deck.category are exported by value, as in the API
+    return {key: value.value if isinstance(value, enum.Enum) else value for key, value in row.items()}
+
+def _generate_ndjson(stmt):
+    for rows in _partitions(stmt):
+        yield ''.join(current_app.json.dumps(_plain(row)) + '\n' for row in rows)
+
+def _generate_csv(stmt):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(stmt.selected_columns.keys())
+    yield buffer.getvalue()
+
+    for rows in _partitions(stmt):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_plain(row).values() for row in rows)
+        yield buffer.getvalue()
+
+def export_response(stmt, export_format, filename):
+    """Stream the rows selected by stmt as NDJSON or CSV with constant memory."""
+    generate = _generate_csv if export_format == 'csv' else _generate_ndjson
+    return Response(
+        stream_with_context(generate(stmt)),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}.{export_format}'}
+    )
@@ -0,0 +1,101 @@
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from sqlalchemy import select, union
+from app import db
+from app.models import Card
+from app.storage import storage_service
+
+THUMBNAIL_PREFIX = 'thumbnails/'
+
+class GCResult:
+    """Counters of a garbage collection run."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.scanned = 0
+        self.referenced = 0
+        self.recent = 0
+        self.orphaned = 0
+        self.deleted = 0
+        self.errors = 0
+
+    def to_dict(self):
+        elapsed = time.monotonic() - self.started
+        return {
+            "scanned": self.scanned,
+            "referenced": self.referenced,
+            "recent": self.recent,
+            "orphaned": self.orphaned,
+            "deleted": self.deleted,
+            "errors": self.errors,
+            "elapsed_seconds": round(elapsed, 2),
+            "objects_per_second": round(self.scanned / elapsed, 1) if elapsed else 0.0
+        }
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def _thumbnail_hash(object_name):
+    # thumbnails/{content_hash}/{size}.webp
+    return object_name[len(THUMBNAIL_PREFIX):].split('/', 1)[0]
+
+def _referenced(object_names):
+    """Return the names among object_names that a card still points to."""
+    images = [name for name in object_names if not name.startswith(THUMBNAIL_PREFIX)]
+    hashes = {_thumbnail_hash(name) for name in object_names if name.startswith(THUMBNAIL_PREFIX)}
+
+    referenced = set()
+    if images:
+        referenced.update(db.session.execute(union(
+            select(Card.front_img).where(Card.front_img.in_(images)),
+            select(Card.back_img).where(Card.back_img.in_(images))
+        )).scalars())
+    if hashes:
+        used_hashes = set(db.session.execute(union(
+            select(Card.front_img_hash).where(Card.front_img_hash.in_(hashes)),
+            select(Card.back_img_hash).where(Card.back_img_hash.in_(hashes))
+        )).scalars())
+        referenced.update(name for name in object_names
+                          if name.startswith(THUMBNAIL_PREFIX) and _thumbnail_hash(name) in used_hashes)
+    db.session.rollback()
+    return referenced
+
+def collect_orphans(grace_seconds, batch_size, dry_run=False, on_batch=None):
+    """Delete the objects of the bucket that no card references anymore.
+
+    The bucket is listed as a stream and checked batch_size keys at a time
+    against the image columns, and thumbnails against the image hashes.
+    Objects younger than grace_seconds are kept, since an upload is stored
+    before the card row pointing to it is committed. With dry_run nothing is
+    deleted. on_batch is called with the result after each batch.
+    """
+    result = GCResult()
+    modified_before = datetime.now(timezone.utc) - timedelta(seconds=grace_seconds)
+
+    for objects in _batches(storage_service.list_files(), batch_size):
+        result.scanned += len(objects)
+        referenced = _referenced([obj.object_name for obj in objects])
+        result.referenced += len(referenced)
+
+        orphans = []
+        for obj in objects:
+            if obj.object_name in referenced:
+                continue
+            if obj.last_modified is None or obj.last_modified > modified_before:
+                result.recent += 1
+            else:
+                orphans.append(obj.object_name)
+        result.orphaned += len(orphans)
+
+        if orphans and not dry_run:
+            errors = storage_service.remove_files(orphans)
+            result.deleted += len(orphans) - errors
+            result.errors += errors
+
+        if on_batch:
+            on_batch(result)
+
+    return result
@@ -0,0 +1,109 @@
+import uuid
+from uuid import UUID
+from app import db
+from app.models import Card, Deck, DrawnCard
+
+REQUIRED_FIELDS = {'front', 'back'}
+MAX_REPORTED_ERRORS = 100
+
+class ImportResult:
+    """Counters of a CSV import, reported back instead of the created cards."""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+    def to_dict(self):
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "error_count": self.error_count,
+            "errors": self.errors
+        }
+
+def has_required_fields(reader):
+    return bool(reader.fieldnames) and all(field in reader.fieldnames for field in REQUIRED_FIELDS)
+
+def _deck_exists(deck_id, known_decks):
+    if deck_id not in known_decks:
+        known_decks[deck_id] = db.session.query(Deck.query.filter_by(id=deck_id).exists()).scalar()
+    return known_decks[deck_id]
+
+def _parse_row(row, known_decks):
+    """Return the card data of a CSV row, or raise ValueError with the reason it is invalid."""
+    if not row.get('front') or not row.get('back'):
+        raise ValueError("Missing required fields")
+
+    deck_id = None
+    if row.get('deck_id'):
+        try:
+            deck_id = UUID(row['deck_id'])
+        except ValueError:
+            raise ValueError("Invalid deck_id format")
+        if not _deck_exists(deck_id, known_decks):
+            raise ValueError(f"Deck with id {deck_id} does not exist")
+
+    return {
+        'id': uuid.uuid4(),
+        'front': row['front'],
+        'back': row['back'],
+        'deck_id': deck_id
+    }
+
+def _insert_batch(batch, result):
+    db.session.execute(Card.__table__.insert(), batch)
+    # Every card has its drawn_card row, the due queue of a deck only reads that table
+    db.session.execute(DrawnCard.__table__.insert(), [
+        {'card_id': card['id'], 'deck_id': card['deck_id'], 'is_drawn': False} for card in batch
+    ])
+    result.created += len(batch)
+    batch.clear()
+
+def import_cards(reader, batch_size, result=None, on_batch=None):
+    """Validate and insert the rows of a csv.DictReader in batches of batch_size.
+
+    Rows are consumed one at a time, so memory stays bounded by the batch size
+    whatever the size of the file. Either every row is inserted or, if any row
+    is invalid, nothing is committed. Counters are updated on result as rows
+    are processed, and on_batch is called after each inserted batch so the
+    caller can report progress while it runs.
+    """
+    result = result or ImportResult()
+    known_decks = {}
+    batch = []
+
+    for i, row in enumerate(reader, start=2):  # start=2 because CSV rows are 1-indexed and we skip header
+        result.rows += 1
+        try:
+            card_data = _parse_row(row, known_decks)
+        except Exception as e:
+            result.add_error(f"Row {i}: {str(e)}")
+            continue
+
+        # Once a row failed nothing will be committed, keep validating only
+        if result.error_count:
+            continue
+
+        batch.append(card_data)
+        if len(batch) >= batch_size:
+            _insert_batch(batch, result)
+            if on_batch:
+                on_batch()
+
+    if result.error_count:
+        db.session.rollback()
+        result.created = 0
+        return result
+
+    if batch:
+        _insert_batch(batch, result)
+    db.session.commit()
+
+    return result
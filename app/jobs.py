@@ -0,0 +1,210 @@
+import csv
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from flask import current_app
+from app import db
+from app.models import BackgroundJob
+from app.importer import ImportResult, import_cards
+from app.deletion import DeletionResult, delete_deck_in_chunks
+from app.draw_state import draw_state
+
+class Job(ABC):
+    """Work running in the background, polled by the client."""
+
+    type = None
+
+    def __init__(self):
+        self.id = uuid.uuid4()
+        self.status = 'queued'
+        self.error = None
+
+    @abstractmethod
+    def run(self, report):
+        """Do the work inside an app context and return the final status.
+
+        report can be called to save the progress made so far.
+        """
+
+    def fail(self, error):
+        self.error = str(error)
+
+    def cleanup(self):
+        pass
+
+    def progress(self):
+        """Counters returned by the status endpoint next to the status."""
+        return {}
+
+class ImportJob(Job):
+    """Import of a spooled CSV file."""
+
+    type = 'import'
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.result = ImportResult()
+
+    def run(self, report):
+        with open(self.path, encoding='utf-8', newline='') as f:
+            import_cards(csv.DictReader(f), current_app.config['CSV_IMPORT_BATCH_SIZE'], self.result, on_batch=report)
+        if self.result.created:
+            draw_state.invalidate_all()
+        return 'failed' if self.result.error_count else 'succeeded'
+
+    def fail(self, error):
+        self.error = f"Error processing CSV file: {str(error)}"
+
+    def cleanup(self):
+        os.remove(self.path)
+
+    def progress(self):
+        return {
+            "rows_parsed": self.result.rows,
+            "rows_inserted": self.result.created,
+            "error_count": self.result.error_count,
+            "errors": self.result.errors
+        }
+
+class DeckDeletionJob(Job):
+    """Deletion of a deck with its cards, draw state and images."""
+
+    type = 'deck_deletion'
+
+    def __init__(self, deck_id):
+        super().__init__()
+        self.deck_id = deck_id
+        self.result = DeletionResult()
+
+    def run(self, report):
+        delete_deck_in_chunks(self.deck_id, current_app.config['DELETE_CHUNK_SIZE'], self.result, on_chunk=report)
+        return 'succeeded'
+
+    def progress(self):
+        return {
+            "deck_id": str(self.deck_id),
+            **self.result.to_dict()
+        }
+
+class JobQueue:
+    """Runs jobs on a thread pool so request workers stay free.
+
+    Jobs run in the process that accepted them, while their status and
+    progress are kept in the background_job table so that any worker can
+    answer a poll. Rows are deleted JOB_TTL seconds after the job finished.
+
+    The rows of unfinished jobs are touched every HEARTBEAT_INTERVAL seconds
+    by the process running them. A job whose row was not touched for
+    JOB_STALE_SECONDS lost its process, and is reported as failed.
+    """
+
+    HEARTBEAT_INTERVAL = 30
+
+    def __init__(self):
+        self._app = None
+        self._executor = None
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._app = app
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config['JOB_WORKERS'],
+            thread_name_prefix='jobs'
+        )
+        threading.Thread(target=self._heartbeat, name='jobs-heartbeat', daemon=True).start()
+
+    def spool(self, stream):
+        """Copy an upload stream to a temporary file the worker can read later."""
+        fd, path = tempfile.mkstemp(prefix='cards-import-', suffix='.csv')
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(stream, f)
+        return path
+
+    def submit(self, job):
+        """Record a job and queue it, then return it."""
+        table = BackgroundJob.__table__
+        try:
+            # On its own connection, so the row is committed whatever the caller's session does
+            with db.engine.begin() as connection:
+                connection.execute(table.delete().where(
+                    table.c.finished_at < db.func.now() - timedelta(seconds=self._app.config['JOB_TTL'])
+                ))
+                connection.execute(table.insert().values(
+                    id=job.id, type=job.type, status=job.status, progress=job.progress()
+                ))
+            with self._lock:
+                self._active.add(job.id)
+            self._executor.submit(self._run, job)
+        except Exception:
+            with self._lock:
+                self._active.discard(job.id)
+            job.cleanup()
+            raise
+        return job
+
+    def get(self, job_id, job_type):
+        """Return the BackgroundJob with this id if it is a job of job_type."""
+        table = BackgroundJob.__table__
+        with db.engine.begin() as connection:
+            connection.execute(table.update().where(
+                table.c.id == job_id,
+                table.c.status.in_(('queued', 'running')),
+                table.c.updated_at < db.func.now() - timedelta(seconds=self._app.config['JOB_STALE_SECONDS'])
+            ).values(
+                status='failed',
+                error="The job was interrupted, its worker stopped before it finished",
+                finished_at=db.func.now()
+            ))
+        return BackgroundJob.query.filter_by(id=job_id, type=job_type.type).first()
+
+    def _heartbeat(self):
+        table = BackgroundJob.__table__
+        while True:
+            time.sleep(self.HEARTBEAT_INTERVAL)
+            with self._lock:
+                active = list(self._active)
+            if not active:
+                continue
+            try:
+                with self._app.app_context(), db.engine.begin() as connection:
+                    connection.execute(table.update().where(table.c.id.in_(active)).values(updated_at=db.func.now()))
+            except Exception as e:
+                self._app.logger.error(f"Error recording job heartbeats: {str(e)}")
+
+    def _save(self, job, finished=False):
+        table = BackgroundJob.__table__
+        values = {'status': job.status, 'error': job.error, 'progress': job.progress()}
+        if finished:
+            values['finished_at'] = db.func.now()
+        # Jobs may be in the middle of their own transaction, progress is committed apart from it
+        with db.engine.begin() as connection:
+            connection.execute(table.update().where(table.c.id == job.id).values(values))
+
+    def _run(self, job):
+        with self._app.app_context():
+            job.status = 'running'
+            try:
+                self._save(job)
+                job.status = job.run(lambda: self._save(job))
+            except Exception as e:
+                db.session.rollback()
+                job.fail(e)
+                job.status = 'failed'
+            finally:
+                with self._lock:
+                    self._active.discard(job.id)
+                job.cleanup()
+                try:
+                    self._save(job, finished=True)
+                except Exception as e:
+                    self._app.logger.error(f"Error saving the status of job {job.id}: {str(e)}")
+
+job_queue = JobQueue()
@@ -3,3 +3,4 @@ from .card import DrawnCard
 from .deck import Deck
 from .deck import DeckCategory
 from app import db
+from .job import BackgroundJob
@@ -1,21 +1,58 @@
 from app import db
 import uuid
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import deferred
 
 class Card(db.Model):
+    __table_args__ = (
+        db.Index('ix_card_created_at_id', 'created_at', 'id'),
+        db.Index('ix_card_deck_id_created_at_id', 'deck_id', 'created_at', 'id'),
+        db.Index('ix_card_search_vector', 'search_vector', postgresql_using='gin'),
+        db.Index('ix_card_front_trgm', 'front', postgresql_using='gin', postgresql_ops={'front': 'gin_trgm_ops'}),
+        db.Index('ix_card_back_trgm', 'back', postgresql_using='gin', postgresql_ops={'back': 'gin_trgm_ops'}),
+        # Lookups of `flask gc-images` by object name and content hash
+        db.Index('ix_card_front_img', 'front_img'),
+        db.Index('ix_card_back_img', 'back_img'),
+        db.Index('ix_card_front_img_hash', 'front_img_hash'),
+        db.Index('ix_card_back_img_hash', 'back_img_hash'),
+    )
+
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     front = db.Column(db.String(255), nullable=False)
     back = db.Column(db.String(255), nullable=False)
     front_img = db.Column(db.Text, nullable=True)
     back_img = db.Column(db.Text, nullable=True)
+    # sha256 of the images, set once their thumbnails have been generated
+    front_img_hash = db.Column(db.String(64), nullable=True)
+    back_img_hash = db.Column(db.String(64), nullable=True)
     deck_id = db.Column(UUID(as_uuid=True), db.ForeignKey('deck.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=db.func.now())
     updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
+    # Maintained by Postgres, only read by search queries
+    search_vector = deferred(db.Column(
+        TSVECTOR,
+        db.Computed("to_tsvector('simple', coalesce(front, '') || ' ' || coalesce(back, ''))", persisted=True)
+    ))
 
 class DrawnCard(db.Model):
+    __table_args__ = (
+        db.Index('ix_drawn_card_card_id', 'card_id', unique=True),
+        # Undrawn cards of a deck, the rows random draws pick from
+        db.Index('ix_drawn_card_deck_id_undrawn', 'deck_id', postgresql_where=db.text('NOT is_drawn')),
+        db.Index('ix_drawn_card_deck_id_due_at', 'deck_id', 'due_at'),
+    )
+
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     card_id = db.Column(UUID(as_uuid=True), db.ForeignKey('card.id'), nullable=False)
     is_drawn = db.Column(db.Boolean, default=False, nullable=False)
+    # Copy of card.deck_id so the due queue of a deck is a single index range scan
+    deck_id = db.Column(UUID(as_uuid=True), db.ForeignKey('deck.id'), nullable=True)
+    # Spaced repetition state, due_at is None until the card is first reviewed
+    due_at = db.Column(db.DateTime, nullable=True)
+    interval_days = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    ease_factor = db.Column(db.Float, default=2.5, server_default='2.5', nullable=False)
+    repetitions = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    reviewed_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=db.func.now())
     updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
 
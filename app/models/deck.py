@@ -11,6 +11,10 @@ class DeckCategory(enum.Enum):
     SYSTEM_DESIGN = "system design"
 
 class Deck(db.Model):
+    __table_args__ = (
+        db.Index('ix_deck_created_at_id', 'created_at', 'id'),
+    )
+
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title = db.Column(db.String(100), nullable=False)
     category = db.Column(Enum(DeckCategory, native_enum=False), nullable=False)
@@ -0,0 +1,26 @@
+from app import db
+import uuid
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+
+class BackgroundJob(db.Model):
+    """Status and progress of a background job, readable by every worker."""
+
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    type = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    error = db.Column(db.Text, nullable=True)
+    # Counters of the job, returned as they are by the status endpoints
+    progress = db.Column(JSONB, nullable=False, default=dict, server_default='{}')
+    created_at = db.Column(db.DateTime, default=db.func.now())
+    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            **self.progress
+        }
@@ -0,0 +1,76 @@
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+from flask import request
+from sqlalchemy import tuple_
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+class PaginationError(ValueError):
+    """Raised when the limit or cursor query parameters are invalid."""
+
+def _encode(values):
+    raw = json.dumps(values).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def _decode(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+
+def encode_cursor(created_at, id):
+    return _encode([created_at.isoformat(), str(id)])
+
+def decode_cursor(cursor):
+    try:
+        created_at, id = _decode(cursor)
+        return datetime.fromisoformat(created_at), UUID(id)
+    except (ValueError, TypeError):
+        raise PaginationError("Invalid cursor")
+
+def encode_rank_cursor(rank, id):
+    """Cursor of a page ordered by a computed rank, such as search results."""
+    return _encode([rank, str(id)])
+
+def decode_rank_cursor(cursor):
+    try:
+        rank, id = _decode(cursor)
+        return float(rank), UUID(id)
+    except (ValueError, TypeError):
+        raise PaginationError("Invalid cursor")
+
+def get_limit():
+    limit = request.args.get('limit', DEFAULT_LIMIT)
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise PaginationError(f"limit must be between 1 and {MAX_LIMIT}")
+    return limit
+
+def paginate(query, model):
+    """Return one page of query and the cursor of the next page, or None on the last page.
+
+    Pages are ordered by (created_at, id) and start right after the row encoded
+    in the cursor query parameter, so deep pages are as cheap as the first one.
+    """
+    limit = get_limit()
+    cursor = request.args.get('cursor')
+
+    order = tuple_(model.created_at, model.id)
+    if cursor:
+        query = query.filter(order > tuple_(*decode_cursor(cursor)))
+
+    items = query.order_by(model.created_at, model.id).limit(limit + 1).all()
+    if len(items) <= limit:
+        return items, None
+
+    items = items[:limit]
+    return items, encode_cursor(items[-1].created_at, items[-1].id)
+
+def paginated_response(response, next_cursor):
+    """Expose the cursor of the next page in the X-Next-Cursor header."""
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
@@ -0,0 +1,86 @@
+import random
+import time
+from contextlib import contextmanager
+from functools import wraps
+import sqlalchemy as sa
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND_PREFIX = 'replica_'
+PIN_COOKIE = 'primary_until'
+
+def replica_reads(view):
+    """Let the queries of a read-only view go to a read replica."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.replica_reads = True
+        return view(*args, **kwargs)
+    return wrapper
+
+@contextmanager
+def primary():
+    """Send the queries made inside the block to the primary, even in a replica_reads view."""
+    previous = g.get('replica_reads', False)
+    g.replica_reads = False
+    try:
+        yield
+    finally:
+        g.replica_reads = previous
+
+def _pinned_to_primary():
+    # Clients that just wrote keep reading from the primary until the replicas caught up
+    try:
+        return float(request.cookies.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+class RoutingSession(Session):
+    """Session sending reads of replica_reads views to a replica, everything else to the primary."""
+
+    def _replica_engine(self):
+        if not has_request_context() or not g.get('replica_reads') or _pinned_to_primary():
+            return None
+
+        if 'replica_bind' not in g:
+            replicas = [key for key in self._db.engines if key and key.startswith(REPLICA_BIND_PREFIX)]
+            # One replica per request, so its reads share a consistent view
+            g.replica_bind = random.choice(replicas) if replicas else None
+        return self._db.engines[g.replica_bind] if g.replica_bind else None
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not isinstance(clause, sa.UpdateBase):
+            engine = self._replica_engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+@sa.event.listens_for(RoutingSession, 'after_commit')
+def _record_write(session):
+    # Drawing a card is a GET that writes, so pins follow commits and not HTTP methods
+    if has_request_context():
+        g.wrote = True
+
+class ReplicaRouter:
+    """Pins clients to the primary for a while after each committed write."""
+
+    def __init__(self):
+        self._pin_seconds = None
+
+    def init_app(self, app):
+        if not any(key.startswith(REPLICA_BIND_PREFIX) for key in app.config.get('SQLALCHEMY_BINDS', {})):
+            return
+        self._pin_seconds = app.config['REPLICA_PIN_SECONDS']
+
+        @app.after_request
+        def pin_writers_to_primary(response):
+            if g.get('wrote'):
+                self.pin(response)
+            return response
+
+    def pin(self, response):
+        """Keep the client of response on the primary, when replicas are configured."""
+        if self._pin_seconds is not None:
+            response.set_cookie(PIN_COOKIE, str(time.time() + self._pin_seconds), max_age=self._pin_seconds, httponly=True)
+        return response
+
+replica_router = ReplicaRouter()
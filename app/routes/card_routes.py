@@ -1,36 +1,103 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify, url_for, abort
+from sqlalchemy import select
 from sqlalchemy.sql.expression import func
 from app.models import db, Card, Deck, DrawnCard
 from app.storage import storage_service
+from app.thumbnails import thumbnails
+from app.serializers import serialize_card, serialize_cards, json_response, CARD_COLUMNS
+from app.draw_state import draw_state
+from app.cache import entity_cache
+from app.replicas import replica_reads
+from app.scheduler import review_card, apply_reviews, due_cards, MIN_GRADE, MAX_GRADE, MAX_BATCH_REVIEWS
+from app.importer import has_required_fields
+from app.jobs import job_queue, ImportJob
+from app.deletion import delete_cards
+from app.exporter import export_response, EXPORT_FORMATS
+from app.caching import make_etag, url_window, conditional_response
+from app.pagination import paginate, paginated_response, get_limit, PaginationError
+from app.search import search_cards
 from werkzeug.utils import secure_filename
 import csv
-import io
+import os
 from uuid import UUID
 
 card_bp = Blueprint('cards', __name__, url_prefix='/cards')
 
-def _get_card_response(card):
-    """Helper function to format card response with presigned URLs."""
-    return {
-        "id": card.id,
-        "front": card.front,
-        "back": card.back,
-        "front_img": storage_service.get_file_url(card.front_img) if card.front_img else None,
-        "back_img": storage_service.get_file_url(card.back_img) if card.back_img else None,
-        "deck_id": card.deck_id,
-        "created_at": card.created_at,
-        "updated_at": card.updated_at
-    }
+MAX_DRAW_COUNT = 100
+DEFAULT_DUE_LIMIT = 20
+MAX_DUE_LIMIT = 500
 
 @card_bp.route('', methods=['GET'])
+@replica_reads
 def get_cards():
-    cards = Card.query.all()
-    return jsonify([_get_card_response(card) for card in cards])
+    query = db.session.query(*CARD_COLUMNS)
+    deck_id = request.args.get('deck_id')
+    if deck_id:
+        try:
+            query = query.filter(Card.deck_id == UUID(deck_id))
+        except ValueError:
+            return jsonify({"error": "Invalid deck_id format"}), 400
+
+    try:
+        cards, next_cursor = paginate(query, Card)
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    etag = make_etag(request.full_path, url_window(), next_cursor, *((card.id, card.updated_at) for card in cards))
+    response = conditional_response(etag, lambda: json_response(serialize_cards(cards)), signed_urls=True)
+    return paginated_response(response, next_cursor)
+
+@card_bp.route('/search', methods=['GET'])
+@replica_reads
+def search():
+    q = request.args.get('q', '')
+    deck_id = request.args.get('deck_id')
+    try:
+        deck_id = UUID(deck_id) if deck_id else None
+    except ValueError:
+        return jsonify({"error": "Invalid deck_id format"}), 400
+
+    try:
+        result = search_cards(q, deck_id, get_limit(), request.args.get('cursor'))
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+    if result is None:
+        return jsonify({"error": "q must contain at least one word"}), 400
+
+    cards, next_cursor = result
+    return paginated_response(json_response(serialize_cards(cards)), next_cursor)
+
+@card_bp.route('/export', methods=['GET'])
+@replica_reads
+def export_cards():
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Invalid format. Valid formats are: {list(EXPORT_FORMATS.keys())}"}), 400
+
+    # CSV exports only carry the columns accepted by POST /cards/import
+    if export_format == 'csv':
+        stmt = select(Card.front, Card.back, Card.deck_id)
+    else:
+        stmt = select(Card.id, Card.front, Card.back, Card.front_img, Card.back_img,
+                      Card.deck_id, Card.created_at, Card.updated_at)
+
+    deck_id = request.args.get('deck_id')
+    if deck_id:
+        try:
+            stmt = stmt.where(Card.deck_id == UUID(deck_id))
+        except ValueError:
+            return jsonify({"error": "Invalid deck_id format"}), 400
+
+    return export_response(stmt.order_by(Card.created_at, Card.id), export_format, 'cards')
 
 @card_bp.route('/<string:card_id>', methods=['GET'])
+@replica_reads
 def get_card(card_id):
-    card = Card.query.get_or_404(card_id)
-    return jsonify(_get_card_response(card))
+    card = entity_cache.get(Card, card_id)
+    if not card:
+        abort(404)
+    etag = make_etag(request.full_path, url_window(), card.id, card.updated_at)
+    return conditional_response(etag, lambda: jsonify(serialize_card(card)), signed_urls=True)
 
 @card_bp.route('', methods=['POST'])
 def create_card():
@@ -47,17 +114,24 @@ def create_card():
         new_card.deck_id = data['deck_id']
 
     db.session.add(new_card)
+    db.session.flush()
+    db.session.add(DrawnCard(card_id=new_card.id, deck_id=new_card.deck_id))
     db.session.commit()
+    draw_state.invalidate(new_card.deck_id)
 
     # Upload images if provided
-    if front_img:
-        new_card.front_img = storage_service.upload_file(front_img, new_card.id, 'front')
-    if back_img:
-        new_card.back_img = storage_service.upload_file(back_img, new_card.id, 'back')
+    uploaded = storage_service.upload_files(new_card.id, front=front_img, back=back_img)
+    if 'front' in uploaded:
+        new_card.front_img = uploaded['front']
+    if 'back' in uploaded:
+        new_card.back_img = uploaded['back']
 
     db.session.commit()
 
-    return jsonify(_get_card_response(new_card)), 201
+    for side, object_name in uploaded.items():
+        thumbnails.submit(new_card.id, side, object_name)
+
+    return jsonify(serialize_card(new_card)), 201
 
 @card_bp.route('/<string:card_id>', methods=['PATCH'])
 def update_card(card_id):
@@ -66,6 +140,7 @@ def update_card(card_id):
     front_img = request.files.get('front_img')
     back_img = request.files.get('back_img')
 
+    previous_deck_id = card.deck_id
     allowed_fields = {'front', 'back', 'deck_id'}
     for field in allowed_fields:
         if field in data:
@@ -73,7 +148,11 @@ def update_card(card_id):
                 if data['deck_id'] is None:
                     card.deck_id = None
                 else:
-                    deck = Deck.query.get(data['deck_id'])
+                    # Checked on the primary, a cached deck may have been deleted meanwhile
+                    try:
+                        deck = db.session.get(Deck, UUID(data['deck_id']))
+                    except ValueError:
+                        deck = None
                     if not deck:
                         return jsonify({"error": f"Deck with id {data['deck_id']} does not exist"}), 400
                     card.deck_id = data['deck_id']
@@ -81,85 +160,160 @@ def update_card(card_id):
                 setattr(card, field, data[field])
 
     # Handle image uploads
-    if front_img:
-        card.front_img = storage_service.upload_file(front_img, card.id, 'front')
-    if back_img:
-        card.back_img = storage_service.upload_file(back_img, card.id, 'back')
+    uploaded = storage_service.upload_files(card.id, front=front_img, back=back_img)
+    replaced = [getattr(card, f"{side}_img") for side in uploaded if getattr(card, f"{side}_img")]
+    if 'front' in uploaded:
+        card.front_img = uploaded['front']
+        card.front_img_hash = None
+    if 'back' in uploaded:
+        card.back_img = uploaded['back']
+        card.back_img_hash = None
 
     db.session.commit()
+    entity_cache.invalidate(Card, card.id)
 
-    return jsonify(_get_card_response(card))
+    for side, object_name in uploaded.items():
+        thumbnails.submit(card.id, side, object_name)
+
+    if replaced:
+        try:
+            storage_service.remove_files(replaced)
+        except Exception as e:
+            # Left for `flask gc-images`
+            current_app.logger.error(f"Error deleting replaced images of card {card.id}: {str(e)}")
+
+    if card.deck_id != previous_deck_id:
+        DrawnCard.query.filter_by(card_id=card.id).update({'deck_id': card.deck_id})
+        db.session.commit()
+        draw_state.invalidate(previous_deck_id)
+        draw_state.invalidate(card.deck_id)
+
+    return jsonify(serialize_card(card))
 
 @card_bp.route('/<string:card_id>', methods=['DELETE'])
 def delete_card(card_id):
     card = Card.query.get_or_404(card_id)
-    db.session.delete(card)
+    # The commit expires card, and its row is gone: read what is needed before
+    card_id, deck_id = card.id, card.deck_id
+    images = [name for name in (card.front_img, card.back_img) if name]
+    delete_cards([card_id])
     db.session.commit()
+    entity_cache.invalidate(Card, card_id)
+    draw_state.invalidate(deck_id)
+
+    if images:
+        try:
+            storage_service.remove_files(images)
+        except Exception as e:
+            # The card is gone already, leftover objects are removed by `flask gc-images`
+            current_app.logger.error(f"Error deleting images of card {card_id}: {str(e)}")
 
     return jsonify({"message": "Card deleted successfully"}), 200
 
 @card_bp.route('/random/<string:deck_id>', methods=['GET'])
 def get_random_card(deck_id):
-    deck = Deck.query.get(deck_id)
-    if not deck:
+    try:
+        deck_id = UUID(deck_id)
+    except ValueError:
         return jsonify({"error": f"Deck with id {deck_id} does not exist"}), 404
 
-    # Get cards in the deck
-    cards_in_deck = Card.query.filter_by(deck_id=deck_id).all()
+    count = request.args.get('count')
+    if count is not None:
+        try:
+            count = int(count)
+        except ValueError:
+            return jsonify({"error": "count must be an integer"}), 400
+        if not 1 <= count <= MAX_DRAW_COUNT:
+            return jsonify({"error": f"count must be between 1 and {MAX_DRAW_COUNT}"}), 400
 
-    if not cards_in_deck:
-        return jsonify({"error": f"No cards available in deck with id {deck_id}"}), 404
-
-    # Check if we have drawn card records for this deck
-    drawn_card_ids = db.session.query(DrawnCard.card_id).filter(
-        DrawnCard.card_id.in_([card.id for card in cards_in_deck]),
-        DrawnCard.is_drawn == True
-    ).all()
-    drawn_card_ids = [str(card_id[0]) for card_id in drawn_card_ids]
-
-    # Filter cards that haven't been drawn yet
-    undrawn_cards = [card for card in cards_in_deck if str(card.id) not in drawn_card_ids]
+    random_cards = draw_state.draw(deck_id, count or 1)
 
-    if not undrawn_cards:
-        return jsonify({"error": f"There are no more cards to be drawn in the Deck: {deck.title}"}), 404
+    if random_cards:
+        # Without count the single card is returned as before, with it a list
+        if count is None:
+            return jsonify(serialize_card(random_cards[0]))
+        return jsonify([serialize_card(card) for card in random_cards])
 
-    # Get a random card from undrawn cards
-    import random
-    random_card = random.choice(undrawn_cards)
-
-    # Mark card as drawn
-    drawn_card = DrawnCard.query.filter_by(card_id=random_card.id).first()
-    if drawn_card:
-        drawn_card.is_drawn = True
-    else:
-        drawn_card = DrawnCard(card_id=random_card.id, is_drawn=True)
-        db.session.add(drawn_card)
+    deck = entity_cache.get(Deck, deck_id)
+    if not deck:
+        return jsonify({"error": f"Deck with id {deck_id} does not exist"}), 404
 
-    db.session.commit()
+    if not db.session.query(Card.query.filter_by(deck_id=deck_id).exists()).scalar():
+        return jsonify({"error": f"No cards available in deck with id {deck_id}"}), 404
 
-    return jsonify(_get_card_response(random_card))
+    return jsonify({"error": f"There are no more cards to be drawn in the Deck: {deck.title}"}), 404
 
 @card_bp.route('/reset/<string:deck_id>', methods=['PUT'])
 def reset_drawn_cards(deck_id):
-    deck = Deck.query.get(deck_id)
+    try:
+        deck = db.session.get(Deck, UUID(deck_id))
+    except ValueError:
+        deck = None
     if not deck:
         return jsonify({"error": f"Deck with id {deck_id} does not exist"}), 404
 
-    # Get all cards in the deck
-    cards_in_deck = Card.query.filter_by(deck_id=deck_id).all()
+    reset_count = draw_state.reset(deck_id)
+
+    return jsonify({
+        "message": f"The Deck with id {deck_id} has been reset",
+        "reset_count": reset_count
+    }), 200
+
+@card_bp.route('/<string:card_id>/review', methods=['POST'])
+def create_review(card_id):
+    card = Card.query.get_or_404(card_id)
+    data = request.get_json()
+
+    grade = data.get('grade')
+    if not isinstance(grade, int) or isinstance(grade, bool) or not MIN_GRADE <= grade <= MAX_GRADE:
+        return jsonify({"error": f"grade must be an integer between {MIN_GRADE} and {MAX_GRADE}"}), 400
 
-    # Reset all drawn cards for this deck
-    for card in cards_in_deck:
-        drawn_card = DrawnCard.query.filter_by(card_id=card.id).first()
-        if drawn_card:
-            drawn_card.is_drawn = False
-        else:
-            drawn_card = DrawnCard(card_id=card.id, is_drawn=False)
-            db.session.add(drawn_card)
+    values = review_card(card, grade)
+    db.session.commit()
 
+    return jsonify({
+        "card_id": card.id,
+        "due_at": values['due_at'],
+        "interval_days": values['interval_days'],
+        "ease_factor": values['ease_factor'],
+        "repetitions": values['repetitions']
+    })
+
+@card_bp.route('/reviews:batch', methods=['POST'])
+def create_reviews_batch():
+    data = request.get_json()
+    reviews = data.get('reviews') if isinstance(data, dict) else data
+    if not isinstance(reviews, list):
+        return jsonify({"error": "Body must be a list of reviews or an object with a 'reviews' list"}), 400
+    if len(reviews) > MAX_BATCH_REVIEWS:
+        return jsonify({"error": f"A batch can hold at most {MAX_BATCH_REVIEWS} reviews"}), 400
+
+    applied, errors = apply_reviews(reviews)
     db.session.commit()
 
-    return jsonify({"message": f"The Deck with id {deck_id} has been reset"}), 200
+    return jsonify({
+        "message": f"Applied {applied} reviews",
+        "applied": applied,
+        "errors": errors
+    })
+
+@card_bp.route('/due/<string:deck_id>', methods=['GET'])
+def get_due_cards(deck_id):
+    deck = entity_cache.get(Deck, deck_id)
+    if not deck:
+        return jsonify({"error": f"Deck with id {deck_id} does not exist"}), 404
+
+    try:
+        limit = int(request.args.get('limit', DEFAULT_DUE_LIMIT))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if not 1 <= limit <= MAX_DUE_LIMIT:
+        return jsonify({"error": f"limit must be between 1 and {MAX_DUE_LIMIT}"}), 400
+
+    return jsonify([
+        {**serialize_card(card), "due_at": due_at}
+        for card, due_at in due_cards(deck.id, limit)
+    ])
 
 @card_bp.route('/import', methods=['POST'])
 def create_cards_from_csv():
@@ -170,76 +324,32 @@ def create_cards_from_csv():
     if not file.filename.endswith('.csv'):
         return jsonify({"error": "File must be a CSV"}), 400
 
-    # Read the CSV file
+    # Keep the upload on disk, the request stream is gone once we return
+    path = job_queue.spool(file.stream)
     try:
-        csv_data = file.read().decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(csv_data))
-
-        # Validate CSV structure (checking if the header contains the required fields)
-        required_fields = {'front', 'back'}
-        if not all(field in csv_reader.fieldnames for field in required_fields):
-            return jsonify({"error": "CSV must contain 'front' and 'back' columns"}), 400
-
-        # Process each row
-        card_data = []
-        errors = []
-        for i, row in enumerate(csv_reader, start=2):  # start=2 because CSV rows are 1-indexed and we skip header
-            try:
-                # Validate required fields
-                if not row.get('front') or not row.get('back'):
-                    errors.append(f"Row {i}: Missing required fields")
-                    continue
-
-                # Validate deck_id if provided
-                deck_id = None
-                if 'deck_id' in row and row['deck_id']:
-                    try:
-                        deck_id = UUID(row['deck_id'])
-                        # Verify deck exists
-                        if not Deck.query.get(deck_id):
-                            errors.append(f"Row {i}: Deck with id {deck_id} does not exist")
-                            continue
-                    except ValueError:
-                        errors.append(f"Row {i}: Invalid deck_id format")
-                        continue
-
-                # Prepare card data for bulk insert
-                card_data.append({
-                    'front': row['front'],
-                    'back': row['back'],
-                    'deck_id': deck_id
-                })
-
-            except Exception as e:
-                errors.append(f"Row {i}: {str(e)}")
-
-        # If there are any errors, don't create any cards
-        if errors:
-            return jsonify({
-                "error": "Some rows had errors",
-                "details": errors
-            }), 400
-
-        # If all validations passed, create all cards in a single batch
-        if card_data:
-            # Use bulk insert to create all cards at once
-            result = db.session.execute(
-                Card.__table__.insert(),
-                card_data
-            )
-            db.session.commit()
-
-            # Fetch the created cards to return in response
-            created_cards = Card.query.filter(
-                Card.id.in_(result.inserted_primary_key_rows)
-            ).all()
-
-            return jsonify({
-                "message": f"Successfully created {len(created_cards)} cards",
-                "cards": [_get_card_response(card) for card in created_cards]
-            }), 201
-        else:
-            return jsonify({"message": "No cards to create"}), 200
-
+        with open(path, encoding='utf-8', newline='') as f:
+            valid_header = has_required_fields(csv.DictReader(f))
     except Exception as e:
+        os.remove(path)
         return jsonify({"error": f"Error processing CSV file: {str(e)}"}), 400
+
+    # Validate CSV structure (checking if the header contains the required fields)
+    if not valid_header:
+        os.remove(path)
+        return jsonify({"error": "CSV must contain 'front' and 'back' columns"}), 400
+
+    job = job_queue.submit(ImportJob(path))
+
+    return jsonify({
+        "message": "Import started",
+        "job_id": job.id,
+        "status_url": url_for('cards.get_import_job', job_id=job.id)
+    }), 202
+
+@card_bp.route('/import/<uuid:job_id>', methods=['GET'])
+def get_import_job(job_id):
+    job = job_queue.get(job_id, ImportJob)
+    if not job:
+        return jsonify({"error": f"Import job with id {job_id} does not exist"}), 404
+
+    return jsonify(job.to_dict())
@@ -1,28 +1,84 @@
-from flask import Blueprint, request, jsonify
-from app.models import db, Deck, DeckCategory
+from flask import Blueprint, request, jsonify, abort, url_for
+from sqlalchemy import select, func
+from app.models import db, Card, Deck, DeckCategory, DrawnCard
+from app.cache import entity_cache
+from app.replicas import replica_reads
+from app.jobs import job_queue, DeckDeletionJob
+from app.exporter import export_response, EXPORT_FORMATS
+from app.caching import make_etag, conditional_response
+from app.pagination import paginate, paginated_response, PaginationError
 
 deck_bp = Blueprint('decks', __name__, url_prefix='/decks')
 
+def _get_deck_stats(deck_ids):
+    """Card, drawn and remaining counts of each deck, computed with one grouped query."""
+    if not deck_ids:
+        return {}
+
+    rows = db.session.query(
+        Card.deck_id,
+        func.count(Card.id),
+        func.count(DrawnCard.id).filter(DrawnCard.is_drawn)
+    ).outerjoin(
+        DrawnCard, DrawnCard.card_id == Card.id
+    ).filter(
+        Card.deck_id.in_(deck_ids)
+    ).group_by(Card.deck_id).all()
+
+    return {
+        deck_id: {
+            "card_count": card_count,
+            "drawn_count": drawn_count,
+            "remaining_count": card_count - drawn_count
+        } for deck_id, card_count, drawn_count in rows
+    }
+
 @deck_bp.route('', methods=['GET'])
+@replica_reads
 def get_decks():
-    decks = Deck.query.all()
+    try:
+        decks, next_cursor = paginate(Deck.query, Deck)
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
 
-    return jsonify([{
+    response = [{
         "id": deck.id,
         "title": deck.title,
         "category": deck.category.value,
         "created_at": deck.created_at,
         "updated_at": deck.updated_at
-    } for deck in decks])
+    } for deck in decks]
+
+    stats = {}
+    if 'stats' in request.args.get('include', '').split(','):
+        stats = _get_deck_stats([deck.id for deck in decks])
+        for deck in response:
+            deck["stats"] = stats.get(deck["id"], {"card_count": 0, "drawn_count": 0, "remaining_count": 0})
+
+    etag = make_etag(request.full_path, next_cursor, *((deck.id, deck.updated_at) for deck in decks), *sorted(stats.items()))
+    return paginated_response(conditional_response(etag, lambda: jsonify(response)), next_cursor)
+
+@deck_bp.route('/export', methods=['GET'])
+@replica_reads
+def export_decks():
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Invalid format. Valid formats are: {list(EXPORT_FORMATS.keys())}"}), 400
+
+    stmt = select(Deck.id, Deck.title, Deck.category, Deck.created_at, Deck.updated_at)
+    return export_response(stmt.order_by(Deck.created_at, Deck.id), export_format, 'decks')
 
 @deck_bp.route('/<string:deck_id>', methods=['GET'])
+@replica_reads
 def get_deck(deck_id):
-    deck = Deck.query.get_or_404(deck_id)
-    return jsonify({
+    deck = entity_cache.get(Deck, deck_id)
+    if not deck:
+        abort(404)
+    return conditional_response(make_etag(deck.id, deck.updated_at), lambda: jsonify({
         "id": deck.id,
         "title": deck.title,
         "category": deck.category.value
-    })
+    }))
 
 @deck_bp.route('', methods=['POST'])
 def create_deck():
@@ -67,6 +123,7 @@ def update_deck(deck_id):
                 setattr(deck, field, data[field])
 
     db.session.commit()
+    entity_cache.invalidate(Deck, deck.id)
 
     return jsonify({
         "id": deck.id,
@@ -77,8 +134,19 @@ def update_deck(deck_id):
 @deck_bp.route('/<string:deck_id>', methods=['DELETE'])
 def delete_deck(deck_id):
     deck = Deck.query.get_or_404(deck_id)
-    db.session.delete(deck)
-    db.session.commit()
+    job = job_queue.submit(DeckDeletionJob(deck.id))
 
-    return jsonify({"message": f"Deck {deck.title} deleted successfully"}), 200
+    return jsonify({
+        "message": f"Deletion of Deck {deck.title} started",
+        "job_id": job.id,
+        "status_url": url_for('decks.get_deletion_job', job_id=job.id)
+    }), 202
+
+@deck_bp.route('/deletions/<uuid:job_id>', methods=['GET'])
+def get_deletion_job(job_id):
+    job = job_queue.get(job_id, DeckDeletionJob)
+    if not job:
+        return jsonify({"error": f"Deletion job with id {job_id} does not exist"}), 404
+
+    return jsonify(job.to_dict())
 
@@ -0,0 +1,34 @@
+import time
+from flask import Blueprint, jsonify
+from sqlalchemy import text
+from app import db
+from app.cache import entity_cache
+from app.storage import storage_service
+
+health_bp = Blueprint('health', __name__, url_prefix='/health')
+
+@health_bp.route('/cache', methods=['GET'])
+def get_cache_health():
+    return jsonify({
+        "entities": entity_cache.stats(),
+        "presigned_urls": storage_service.url_cache.stats()
+    })
+
+@health_bp.route('/db', methods=['GET'])
+def get_db_health():
+    pool = db.engine.pool
+    stats = {
+        "pool_size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow()
+    }
+
+    start = time.perf_counter()
+    try:
+        db.session.execute(text("SELECT 1"))
+    except Exception as e:
+        return jsonify({"status": "unavailable", "error": str(e), "pool": stats}), 503
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    return jsonify({"status": "ok", "latency_ms": round(latency_ms, 2), "pool": stats})
@@ -0,0 +1,167 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+from sqlalchemy.dialects.postgresql import insert
+from app import db
+from app.models import Card, DrawnCard
+
+MIN_GRADE = 0
+MAX_GRADE = 5
+PASSING_GRADE = 3
+MIN_EASE_FACTOR = 1.3
+INITIAL_STATE = (0, 0, 2.5)
+MAX_BATCH_REVIEWS = 1000
+
+def schedule(grade, repetitions, interval_days, ease_factor):
+    """Apply an SM-2 review grade (0-5) and return the new (repetitions, interval_days, ease_factor)."""
+    if grade >= PASSING_GRADE:
+        if repetitions == 0:
+            interval_days = 1
+        elif repetitions == 1:
+            interval_days = 6
+        else:
+            interval_days = round(interval_days * ease_factor)
+        repetitions += 1
+    else:
+        repetitions = 0
+        interval_days = 1
+
+    ease_factor += 0.1 - (MAX_GRADE - grade) * (0.08 + (MAX_GRADE - grade) * 0.02)
+    return repetitions, interval_days, max(MIN_EASE_FACTOR, ease_factor)
+
+def _previous(state):
+    if state is None:
+        return INITIAL_STATE
+    return state.repetitions, state.interval_days, state.ease_factor
+
+def review_values(card, previous, grade, reviewed_at):
+    """Return the drawn_card column values of card after a review graded at reviewed_at.
+
+    previous is the (repetitions, interval_days, ease_factor) of the card before
+    the review.
+    """
+    repetitions, interval_days, ease_factor = schedule(grade, *previous)
+    return {
+        'card_id': card.id,
+        'deck_id': card.deck_id,
+        'repetitions': repetitions,
+        'interval_days': interval_days,
+        'ease_factor': ease_factor,
+        'due_at': reviewed_at + timedelta(days=interval_days),
+        'reviewed_at': reviewed_at
+    }
+
+def upsert_reviews(values):
+    """Write review values built by review_values with a single statement."""
+    stmt = insert(DrawnCard).values([{'id': uuid.uuid4(), 'is_drawn': False, **row} for row in values])
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['card_id'],
+        set_={
+            'deck_id': stmt.excluded.deck_id,
+            'repetitions': stmt.excluded.repetitions,
+            'interval_days': stmt.excluded.interval_days,
+            'ease_factor': stmt.excluded.ease_factor,
+            'due_at': stmt.excluded.due_at,
+            'reviewed_at': stmt.excluded.reviewed_at,
+            'updated_at': db.func.now()
+        }
+    ))
+
+def review_card(card, grade):
+    """Record a review of card and return its new scheduling values. The caller commits."""
+    state = DrawnCard.query.filter_by(card_id=card.id).with_for_update().first()
+    values = review_values(card, _previous(state), grade, datetime.utcnow())
+    upsert_reviews([values])
+    return values
+
+def _parse_review(item):
+    """Return (card_id, grade, reviewed_at) of a batch item, or raise ValueError."""
+    if not isinstance(item, dict):
+        raise ValueError("Review must be an object")
+    try:
+        card_id = UUID(str(item.get('card_id')))
+    except ValueError:
+        raise ValueError("Invalid card_id format")
+
+    grade = item.get('grade')
+    if not isinstance(grade, int) or isinstance(grade, bool) or not MIN_GRADE <= grade <= MAX_GRADE:
+        raise ValueError(f"grade must be an integer between {MIN_GRADE} and {MAX_GRADE}")
+
+    reviewed_at = datetime.utcnow()
+    if item.get('reviewed_at'):
+        try:
+            reviewed_at = datetime.fromisoformat(item['reviewed_at'])
+        except (TypeError, ValueError):
+            raise ValueError("Invalid reviewed_at format")
+        # Stored timestamps are naive UTC
+        if reviewed_at.tzinfo:
+            reviewed_at = reviewed_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return card_id, grade, reviewed_at
+
+def apply_reviews(items):
+    """Apply a batch of offline reviews with one read of the cards and one upsert.
+
+    Each item is a {"card_id", "grade", "reviewed_at"} object, reviewed_at being
+    optional. Invalid items are reported and skipped, the others are applied in
+    reviewed_at order. Returns (applied, errors) where errors holds
+    {"index", "error"} objects. The caller commits.
+    """
+    errors = []
+    reviews = []
+    for index, item in enumerate(items):
+        try:
+            reviews.append((index, *_parse_review(item)))
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+
+    card_ids = {card_id for _, card_id, _, _ in reviews}
+    cards = {card.id: card for card in Card.query.filter(Card.id.in_(card_ids))} if card_ids else {}
+    states = {
+        state.card_id: _previous(state)
+        for state in DrawnCard.query.filter(DrawnCard.card_id.in_(list(cards))).with_for_update()
+    } if cards else {}
+
+    values = {}
+    applied = 0
+    for index, card_id, grade, reviewed_at in sorted(reviews, key=lambda review: review[3]):
+        card = cards.get(card_id)
+        if not card:
+            errors.append({"index": index, "error": f"Card with id {card_id} does not exist"})
+            continue
+
+        values[card_id] = review_values(card, states.get(card_id, INITIAL_STATE), grade, reviewed_at)
+        states[card_id] = (values[card_id]['repetitions'], values[card_id]['interval_days'], values[card_id]['ease_factor'])
+        applied += 1
+
+    if values:
+        upsert_reviews(list(values.values()))
+
+    return applied, sorted(errors, key=lambda error: error['index'])
+
+def due_cards(deck_id, limit, now=None):
+    """Return up to limit (card, due_at) pairs of the deck that are due for review.
+
+    Cards whose due date has passed come first, oldest due first, read with a
+    range scan of the (deck_id, due_at) index. Remaining room is filled with
+    cards that were never reviewed, with a due_at of None, read from the same
+    index since every card has a drawn_card row.
+    """
+    now = now or datetime.utcnow()
+    due = db.session.query(Card, DrawnCard.due_at).join(
+        DrawnCard, DrawnCard.card_id == Card.id
+    ).filter(
+        DrawnCard.deck_id == deck_id,
+        DrawnCard.due_at <= now
+    ).order_by(DrawnCard.due_at).limit(limit).all()
+
+    if len(due) < limit:
+        new = db.session.query(Card, DrawnCard.due_at).join(
+            DrawnCard, DrawnCard.card_id == Card.id
+        ).filter(
+            DrawnCard.deck_id == deck_id,
+            DrawnCard.due_at.is_(None)
+        ).limit(limit - len(due)).all()
+        due.extend(new)
+
+    return due
@@ -0,0 +1,50 @@
+import re
+from sqlalchemy import Float, func, literal, or_, tuple_
+from app import db
+from app.models import Card
+from app.pagination import encode_rank_cursor, decode_rank_cursor
+from app.serializers import CARD_COLUMNS
+
+TEXT_SEARCH_CONFIG = 'simple'
+
+def _prefix_tsquery(q):
+    """tsquery matching every word of q as a prefix, or None if q has no word."""
+    words = re.findall(r'\w+', q)
+    if not words:
+        return None
+    return ' & '.join(f"{word}:*" for word in words)
+
+def search_cards(q, deck_id, limit, cursor=None):
+    """Return a page of cards matching q, best first, and the cursor of the next page.
+
+    Cards match on the prefixes of the words of q through the GIN index of
+    card.search_vector, or fuzzily through the trigram indexes of front and
+    back. Returns None when q has no word to search for.
+    """
+    prefix_query = _prefix_tsquery(q)
+    if prefix_query is None:
+        return None
+
+    tsquery = func.to_tsquery(TEXT_SEARCH_CONFIG, prefix_query)
+    q = literal(q)
+    rank = (
+        func.ts_rank(Card.search_vector, tsquery)
+        + func.greatest(func.word_similarity(q, Card.front), func.word_similarity(q, Card.back))
+    ).cast(Float).label('rank')
+
+    query = db.session.query(*CARD_COLUMNS, rank).filter(or_(
+        Card.search_vector.op('@@')(tsquery),
+        q.op('<%')(Card.front),
+        q.op('<%')(Card.back)
+    ))
+    if deck_id:
+        query = query.filter(Card.deck_id == deck_id)
+    if cursor:
+        query = query.filter(tuple_(rank, Card.id) < tuple_(*decode_rank_cursor(cursor)))
+
+    rows = query.order_by(rank.desc(), Card.id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_rank_cursor(rows[-1].rank, rows[-1].id)
@@ -0,0 +1,63 @@
+from flask import current_app, jsonify, request
+from werkzeug.http import http_date
+from app.models import Card
+from app.storage import storage_service
+from app.thumbnails import thumbnail_name, THUMBNAIL_SIZES
+
+try:
+    import orjson
+except ImportError:  # Installed by requirements.txt, Flask's JSON provider is used without it
+    orjson = None
+
+# Columns read by list endpoints instead of full Card entities
+CARD_COLUMNS = (
+    Card.id, Card.front, Card.back, Card.front_img, Card.back_img,
+    Card.front_img_hash, Card.back_img_hash, Card.deck_id, Card.created_at, Card.updated_at
+)
+
+def _format_uuid(value):
+    return str(value) if value is not None else None
+
+def _format_datetime(value):
+    # Same format as Flask's JSON provider, so responses do not change
+    return http_date(value) if value is not None else None
+
+def _image_url(object_name, content_hash, size):
+    """Presigned URL of an image, or of its thumbnail when a known size is requested and ready."""
+    if not object_name:
+        return None
+    if size in THUMBNAIL_SIZES and content_hash:
+        return storage_service.get_file_url(thumbnail_name(content_hash, size))
+    return storage_service.get_file_url(object_name)
+
+def serialize_card(card, size=None):
+    """Format a Card, or a row of CARD_COLUMNS, with presigned URLs and plain JSON values."""
+    if size is None:
+        size = request.args.get('size')
+    return {
+        "id": _format_uuid(card.id),
+        "front": card.front,
+        "back": card.back,
+        "front_img": _image_url(card.front_img, card.front_img_hash, size),
+        "back_img": _image_url(card.back_img, card.back_img_hash, size),
+        "deck_id": _format_uuid(card.deck_id),
+        "created_at": _format_datetime(card.created_at),
+        "updated_at": _format_datetime(card.updated_at)
+    }
+
+def serialize_cards(rows):
+    # Read ?size= once for the whole list, '' stands for no size
+    size = request.args.get('size') or ''
+    return [serialize_card(row, size) for row in rows]
+
+def json_response(payload, status=200):
+    """Encode already formatted data with orjson when it is installed."""
+    if orjson is None:
+        response = jsonify(payload)
+        response.status_code = status
+        return response
+    return current_app.response_class(
+        orjson.dumps(payload, option=orjson.OPT_SORT_KEYS),
+        status=status,
+        mimetype='application/json'
+    )
@@ -1,59 +1,225 @@
 from minio import Minio
+from minio.commonconfig import CopySource, REPLACE
+from minio.deleteobjects import DeleteObject
+from minio.error import S3Error
 from flask import current_app
+import io
 import os
+import threading
+import uuid
+import urllib3
+from concurrent.futures import ThreadPoolExecutor
+import time
+from collections import OrderedDict
 from datetime import timedelta
 import magic
 
+class PresignedUrlCache:
+    """Bounded LRU of presigned URLs keyed by object name.
+
+    A URL is reused until it gets within refresh_margin of its expiry, so
+    listing cards does not sign every image again on each request.
+    """
+
+    def __init__(self, max_size, expires, refresh_margin):
+        self.max_size = max_size
+        self.ttl = (expires - refresh_margin).total_seconds()
+        self.hits = 0
+        self.misses = 0
+        self._urls = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, object_name):
+        with self._lock:
+            entry = self._urls.get(object_name)
+            if entry and entry[1] > time.monotonic():
+                self._urls.move_to_end(object_name)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def set(self, object_name, url):
+        with self._lock:
+            self._urls[object_name] = (url, time.monotonic() + self.ttl)
+            self._urls.move_to_end(object_name)
+            while len(self._urls) > self.max_size:
+                self._urls.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._urls), "hits": self.hits, "misses": self.misses}
+
 class StorageService:
+    URL_EXPIRES = timedelta(days=7)
+    URL_REFRESH_MARGIN = timedelta(days=1)
+    URL_CACHE_SIZE = 100000
+    UPLOAD_WORKERS = 8
+    # Uploads are streamed in multipart parts of this size, so their length
+    # does not need to be known upfront
+    UPLOAD_PART_SIZE = 10 * 1024 * 1024
+    HTTP_POOL_SIZE = 16
+
     def __init__(self):
-        self.client = Minio(
-            "localhost:9000",
-            access_key="minioadmin",
-            secret_key="minioadmin",
-            secure=False
+        self._config = None
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.bucket_name = None
+        self.url_cache = PresignedUrlCache(self.URL_CACHE_SIZE, self.URL_EXPIRES, self.URL_REFRESH_MARGIN)
+        self._upload_executor = ThreadPoolExecutor(max_workers=self.UPLOAD_WORKERS, thread_name_prefix='storage-upload')
+
+    def init_app(self, app):
+        """Read the MinIO settings of the app. No connection is made until the client is first used."""
+        self._config = {
+            'endpoint': app.config['MINIO_ENDPOINT'],
+            'access_key': app.config['MINIO_ACCESS_KEY'],
+            'secret_key': app.config['MINIO_SECRET_KEY'],
+            'secure': app.config['MINIO_SECURE'],
+            'region': app.config['MINIO_REGION'],
+            'ensure_bucket': app.config['MINIO_ENSURE_BUCKET']
+        }
+        self.bucket_name = app.config['MINIO_BUCKET']
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    def _create_client(self):
+        if self._config is None:
+            raise RuntimeError("StorageService.init_app must be called before using the storage")
+
+        client = Minio(
+            self._config['endpoint'],
+            access_key=self._config['access_key'],
+            secret_key=self._config['secret_key'],
+            secure=self._config['secure'],
+            # A known region spares a bucket location request before the first signature
+            region=self._config['region'],
+            http_client=urllib3.PoolManager(
+                maxsize=self.HTTP_POOL_SIZE,
+                timeout=urllib3.Timeout(connect=5, read=60),
+                retries=urllib3.Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504])
+            )
         )
-        self.bucket_name = "flash-cards"
-        self._ensure_bucket_exists()
+        # The bucket is normally created once per deployment with `flask init-storage`
+        if self._config['ensure_bucket']:
+            self._ensure_bucket_exists(client)
+        return client
+
+    def _ensure_bucket_exists(self, client):
+        if not client.bucket_exists(self.bucket_name):
+            client.make_bucket(self.bucket_name)
 
-    def _ensure_bucket_exists(self):
-        if not self.client.bucket_exists(self.bucket_name):
-            self.client.make_bucket(self.bucket_name)
+    def init_bucket(self):
+        """Create the bucket if it does not exist yet."""
+        self._ensure_bucket_exists(self.client)
 
     def upload_file(self, file, card_id, side):
         """Upload a file to MinIO and return the object path."""
         if not file:
             return None
 
-        # Generate a unique filename
+        # Generate a unique filename, every upload gets its own so work queued
+        # for a replaced image can tell it is stale
         file_extension = os.path.splitext(file.filename)[1]
-        object_name = f"{card_id}/{side}{file_extension}"
+        object_name = f"{card_id}/{side}-{uuid.uuid4().hex}{file_extension}"
 
-        # Get file size and content type
-        file_size = os.fstat(file.fileno()).st_size
+        # Get content type
         content_type = magic.from_buffer(file.read(2048), mime=True)
         file.seek(0)  # Reset file pointer
 
-        # Upload the file
+        # Upload the file, streaming it in parts since its size is unknown
         self.client.put_object(
             self.bucket_name,
             object_name,
-            file,
-            file_size,
+            file.stream,
+            length=-1,
+            part_size=self.UPLOAD_PART_SIZE,
             content_type=content_type
         )
 
         return object_name
 
+    def upload_files(self, card_id, **files):
+        """Upload the files of a card concurrently, keyed by side, and return their object paths.
+
+        Sides without a file are left out of the result.
+        """
+        futures = {
+            side: self._upload_executor.submit(self.upload_file, file, card_id, side)
+            for side, file in files.items() if file
+        }
+        return {side: future.result() for side, future in futures.items()}
+
+    def read_file(self, object_name):
+        """Return the content of an object."""
+        response = self.client.get_object(self.bucket_name, object_name)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def touch_file(self, object_name, content_type):
+        """Refresh the last modified time of an object by copying it onto itself.
+
+        Returns False when the object does not exist.
+        """
+        try:
+            self.client.copy_object(
+                self.bucket_name,
+                object_name,
+                CopySource(self.bucket_name, object_name),
+                metadata={'Content-Type': content_type},
+                metadata_directive=REPLACE
+            )
+            return True
+        except S3Error as e:
+            if e.code == 'NoSuchKey':
+                return False
+            raise
+
+    def put_bytes(self, object_name, data, content_type):
+        """Store an in-memory object and return its path."""
+        self.client.put_object(self.bucket_name, object_name, io.BytesIO(data), len(data), content_type=content_type)
+        return object_name
+
+    def list_files(self, prefix=None):
+        """Iterate over every object of the bucket, listed page by page as it is consumed."""
+        return self.client.list_objects(self.bucket_name, prefix=prefix, recursive=True)
+
+    def remove_files(self, object_names):
+        """Delete objects with bulk requests and return how many could not be deleted."""
+        errors = self.client.remove_objects(
+            self.bucket_name,
+            (DeleteObject(object_name) for object_name in object_names)
+        )
+        # Deletion is lazy, it only happens while the errors are consumed
+        error_count = 0
+        for error in errors:
+            current_app.logger.error(f"Error deleting {error.name}: {error.message}")
+            error_count += 1
+        return error_count
+
     def get_file_url(self, object_name):
-        """Generate a presigned URL for the object."""
+        """Generate a presigned URL for the object, reusing a cached one while it is still fresh."""
         if not object_name:
             return None
+        url = self.url_cache.get(object_name)
+        if url:
+            return url
         try:
-            return self.client.presigned_get_object(
+            url = self.client.presigned_get_object(
                 self.bucket_name,
                 object_name,
-                expires=timedelta(days=7)
+                expires=self.URL_EXPIRES
             )
+            self.url_cache.set(object_name, url)
+            return url
         except Exception as e:
             current_app.logger.error(f"Error generating presigned URL: {str(e)}")
             return None
@@ -0,0 +1,78 @@
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from app import db
+from app.models import Card
+from app.storage import storage_service
+from app.cache import entity_cache
+
+# Longest side in pixels of each derivative served through ?size=
+THUMBNAIL_SIZES = {
+    'small': 128,
+    'medium': 512
+}
+THUMBNAIL_FORMAT = 'WEBP'
+THUMBNAIL_CONTENT_TYPE = 'image/webp'
+
+def thumbnail_name(content_hash, size):
+    """Derivatives are addressed by the hash of the original, so identical images share them."""
+    return f"thumbnails/{content_hash}/{size}.webp"
+
+def _resize(image, max_side):
+    thumbnail = image.copy()
+    thumbnail.thumbnail((max_side, max_side))
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, THUMBNAIL_FORMAT)
+    return buffer.getvalue()
+
+class ThumbnailGenerator:
+    """Generates the derivatives of uploaded card images off the request path."""
+
+    def __init__(self):
+        self._app = None
+        self._executor = None
+
+    def init_app(self, app):
+        self._app = app
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config['THUMBNAIL_WORKERS'],
+            thread_name_prefix='thumbnails'
+        )
+
+    def submit(self, card_id, side, object_name):
+        """Queue the derivatives of the image stored at object_name for a card side."""
+        self._executor.submit(self._generate, card_id, side, object_name)
+
+    def _generate(self, card_id, side, object_name):
+        with self._app.app_context():
+            try:
+                data = storage_service.read_file(object_name)
+                content_hash = hashlib.sha256(data).hexdigest()
+
+                # Another card already uploaded the same image. Its thumbnails are
+                # touched so `flask gc-images` sees them as recent until the hash
+                # below is recorded, they may be old enough to look orphaned.
+                if not all(storage_service.touch_file(thumbnail_name(content_hash, size), THUMBNAIL_CONTENT_TYPE)
+                           for size in THUMBNAIL_SIZES):
+                    image = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+                    if image.mode not in ('RGB', 'RGBA'):
+                        image = image.convert('RGBA')
+                    for size, max_side in THUMBNAIL_SIZES.items():
+                        storage_service.put_bytes(thumbnail_name(content_hash, size), _resize(image, max_side), THUMBNAIL_CONTENT_TYPE)
+
+                # Only record the hash if the card still shows this image. Object
+                # names are unique per upload, so a replaced image never matches.
+                img_column = getattr(Card, f"{side}_img")
+                db.session.execute(
+                    Card.__table__.update()
+                    .where(Card.id == card_id, img_column == object_name)
+                    .values({f"{side}_img_hash": content_hash})
+                )
+                db.session.commit()
+                entity_cache.invalidate(Card, card_id)
+            except Exception as e:
+                db.session.rollback()
+                self._app.logger.error(f"Error generating thumbnails of {object_name}: {str(e)}")
+
+thumbnails = ThumbnailGenerator()
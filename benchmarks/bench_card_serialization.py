@@ -0,0 +1,73 @@
+"""Compare the rows per second of GET /cards before and after the column serialization.
+
+Runs the query and the serialization of every page of the card table, as
+GET /cards?limit=<page size> walks it, against the database of DATABASE_URL.
+Seed it first (python seed.py, or an import of a large CSV) so the table
+holds a representative number of cards.
+
+    python -m benchmarks.bench_card_serialization [pages] [page size]
+"""
+import sys
+import time
+from flask import jsonify
+from app import create_app, db
+from app.models import Card
+from app.serializers import CARD_COLUMNS, serialize_cards, json_response, orjson
+from app.storage import storage_service
+from app.pagination import paginate, MAX_LIMIT
+
+def _legacy_card_response(card):
+    # GET /cards before the serialization layer: a dict of raw values per
+    # ORM entity, left for jsonify to convert
+    return {
+        "id": card.id,
+        "front": card.front,
+        "back": card.back,
+        "front_img": storage_service.get_file_url(card.front_img),
+        "back_img": storage_service.get_file_url(card.back_img),
+        "deck_id": card.deck_id,
+        "created_at": card.created_at,
+        "updated_at": card.updated_at
+    }
+
+def _legacy_page():
+    cards, next_cursor = paginate(Card.query, Card)
+    return jsonify([_legacy_card_response(card) for card in cards]), len(cards), next_cursor
+
+def _current_page():
+    rows, next_cursor = paginate(db.session.query(*CARD_COLUMNS), Card)
+    return json_response(serialize_cards(rows)), len(rows), next_cursor
+
+def _measure(app, name, page, pages, page_size):
+    rows = 0
+    cursor = None
+    start = time.perf_counter()
+    for _ in range(pages):
+        url = f"/cards?limit={page_size}" + (f"&cursor={cursor}" if cursor else "")
+        with app.test_request_context(url):
+            response, count, cursor = page()
+            response.get_data()
+            # One session per request, as in the app
+            db.session.remove()
+        rows += count
+        if not cursor:
+            break
+    elapsed = time.perf_counter() - start
+    print(f"{name:<10} {rows / elapsed:>12,.0f} rows/s  ({rows:,} rows in {elapsed:.2f}s)")
+
+def main(pages, page_size):
+    app = create_app()
+    with app.app_context():
+        total = db.session.query(db.func.count(Card.id)).scalar()
+    print(f"{total:,} cards, up to {pages} pages of {page_size}, orjson {'on' if orjson else 'off'}")
+
+    # Warm up the connection pool and the presigned URL cache of both paths alike
+    _measure(app, 'warmup', _current_page, 1, page_size)
+    _measure(app, 'before', _legacy_page, pages, page_size)
+    _measure(app, 'after', _current_page, pages, page_size)
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+        int(sys.argv[2]) if len(sys.argv) > 2 else MAX_LIMIT
+    )
@@ -4,6 +4,7 @@ from logging.config import fileConfig
 from flask import current_app
 
 from alembic import context
+import sqlalchemy as sa
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -104,6 +105,10 @@ def run_migrations_online():
         )
 
         with context.begin_transaction():
+            # The app's statement and lock timeouts would cancel backfills and
+            # index builds on large tables, lift them for this transaction only
+            connection.execute(sa.text("SET LOCAL statement_timeout = 0"))
+            connection.execute(sa.text("SET LOCAL lock_timeout = 0"))
             context.run_migrations()
 
 
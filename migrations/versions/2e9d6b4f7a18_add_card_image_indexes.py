@@ -0,0 +1,32 @@
+"""Add indexes on the image columns of Card
+
+Revision ID: 2e9d6b4f7a18
+Revises: 8c41e7a9d2f3
+Create Date: 2026-10-18 19:12:06.583941
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2e9d6b4f7a18'
+down_revision = '8c41e7a9d2f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('card', schema=None) as batch_op:
+        batch_op.create_index('ix_card_front_img', ['front_img'], unique=False)
+        batch_op.create_index('ix_card_back_img', ['back_img'], unique=False)
+        batch_op.create_index('ix_card_front_img_hash', ['front_img_hash'], unique=False)
+        batch_op.create_index('ix_card_back_img_hash', ['back_img_hash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('card', schema=None) as batch_op:
+        batch_op.drop_index('ix_card_back_img_hash')
+        batch_op.drop_index('ix_card_front_img_hash')
+        batch_op.drop_index('ix_card_back_img')
+        batch_op.drop_index('ix_card_front_img')
@@ -0,0 +1,42 @@
+"""Add full-text search vector and trigram indexes to Card
+
+Revision ID: 3c9e85a1b6d4
+Revises: e6b07d19f2a5
+Create Date: 2026-10-18 16:20:14.551872
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e85a1b6d4'
+down_revision = 'e6b07d19f2a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    with op.batch_alter_table('card', schema=None) as batch_op:
+        batch_op.add_column(sa.Column(
+            'search_vector',
+            TSVECTOR(),
+            sa.Computed("to_tsvector('simple', coalesce(front, '') || ' ' || coalesce(back, ''))", persisted=True),
+            nullable=True
+        ))
+        batch_op.create_index('ix_card_search_vector', ['search_vector'], unique=False, postgresql_using='gin')
+        batch_op.create_index('ix_card_front_trgm', ['front'], unique=False, postgresql_using='gin',
+                              postgresql_ops={'front': 'gin_trgm_ops'})
+        batch_op.create_index('ix_card_back_trgm', ['back'], unique=False, postgresql_using='gin',
+                              postgresql_ops={'back': 'gin_trgm_ops'})
+
+
+def downgrade():
+    with op.batch_alter_table('card', schema=None) as batch_op:
+        batch_op.drop_index('ix_card_back_trgm')
+        batch_op.drop_index('ix_card_front_trgm')
+        batch_op.drop_index('ix_card_search_vector')
+        batch_op.drop_column('search_vector')
@@ -0,0 +1,35 @@
+"""Add background_job table
+
+Revision ID: 5f3b8d2c9e14
+Revises: 3c9e85a1b6d4
+Create Date: 2026-10-18 18:02:31.408127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+
+
+# revision identifiers, used by Alembic.
+revision = '5f3b8d2c9e14'
+down_revision = '3c9e85a1b6d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('background_job',
+    sa.Column('id', UUID(as_uuid=True), nullable=False),
+    sa.Column('type', sa.String(length=50), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('progress', JSONB(), server_default='{}', nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('background_job')
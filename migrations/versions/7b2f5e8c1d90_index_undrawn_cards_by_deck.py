@@ -0,0 +1,32 @@
+"""Index undrawn cards by deck instead of by card
+
+Revision ID: 7b2f5e8c1d90
+Revises: 2e9d6b4f7a18
+Create Date: 2026-10-18 20:05:44.902316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2f5e8c1d90'
+down_revision = '2e9d6b4f7a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Draws now start from drawn_card, which can use a partial index on the
+    # undrawn rows of a deck; the per card one could not serve the outer join
+    with op.batch_alter_table('drawn_card', schema=None) as batch_op:
+        batch_op.drop_index('ix_drawn_card_undrawn')
+        batch_op.create_index('ix_drawn_card_deck_id_undrawn', ['deck_id'], unique=False,
+                              postgresql_where=sa.text('NOT is_drawn'))
+
+
+def downgrade():
+    with op.batch_alter_table('drawn_card', schema=None) as batch_op:
+        batch_op.drop_index('ix_drawn_card_deck_id_undrawn')
+        batch_op.create_index('ix_drawn_card_undrawn', ['card_id'], unique=False,
+                              postgresql_where=sa.text('NOT is_drawn'))
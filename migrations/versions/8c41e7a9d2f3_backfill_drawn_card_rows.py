@@ -0,0 +1,32 @@
+"""Create the missing drawn_card row of every card
+
+Revision ID: 8c41e7a9d2f3
+Revises: 5f3b8d2c9e14
+Create Date: 2026-10-18 18:40:52.117390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41e7a9d2f3'
+down_revision = '5f3b8d2c9e14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Cards now get their drawn_card row when created, so the due queue of a
+    # deck never has to look at the card table
+    op.execute("""
+        INSERT INTO drawn_card (id, card_id, deck_id, is_drawn, created_at, updated_at)
+        SELECT gen_random_uuid(), card.id, card.deck_id, false, now(), now()
+        FROM card
+        WHERE NOT EXISTS (SELECT 1 FROM drawn_card WHERE drawn_card.card_id = card.id)
+        ON CONFLICT (card_id) DO NOTHING
+    """)
+
+
+def downgrade():
+    pass
@@ -0,0 +1,45 @@
+"""Add spaced repetition state and deck_id to DrawnCard
+
+Revision ID: 9a4f62c0d3b8
+Revises: d81c5a3e6f07
+Create Date: 2026-10-18 12:41:09.734126
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4f62c0d3b8'
+down_revision = 'd81c5a3e6f07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('drawn_card', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('deck_id', UUID(as_uuid=True), nullable=True))
+        batch_op.add_column(sa.Column('due_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('interval_days', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('ease_factor', sa.Float(), server_default='2.5', nullable=False))
+        batch_op.add_column(sa.Column('repetitions', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('reviewed_at', sa.DateTime(), nullable=True))
+        batch_op.create_foreign_key('drawn_card_deck_id_fkey', 'deck', ['deck_id'], ['id'])
+
+    op.execute("UPDATE drawn_card SET deck_id = card.deck_id FROM card WHERE card.id = drawn_card.card_id")
+
+    with op.batch_alter_table('drawn_card', schema=None) as batch_op:
+        batch_op.create_index('ix_drawn_card_deck_id_due_at', ['deck_id', 'due_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('drawn_card', schema=None) as batch_op:
+        batch_op.drop_index('ix_drawn_card_deck_id_due_at')
+        batch_op.drop_constraint('drawn_card_deck_id_fkey', type_='foreignkey')
+        batch_op.drop_column('reviewed_at')
+        batch_op.drop_column('repetitions')
+        batch_op.drop_column('ease_factor')
+        batch_op.drop_column('interval_days')
+        batch_op.drop_column('due_at')
+        batch_op.drop_column('deck_id')
@@ -0,0 +1,44 @@
+"""Add draw tracking indexes and unique card_id on drawn_card
+
+Revision ID: d81c5a3e6f07
+Revises: b3e1f09a7c42
+Create Date: 2026-10-18 11:05:47.220514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81c5a3e6f07'
+down_revision = 'b3e1f09a7c42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep a single drawn_card row per card (preferring drawn ones) before
+    # making card_id unique
+    op.execute("""
+        DELETE FROM drawn_card d
+        USING drawn_card o
+        WHERE d.card_id = o.card_id
+          AND (d.is_drawn, d.id) < (o.is_drawn, o.id)
+    """)
+
+    with op.batch_alter_table('card', schema=None) as batch_op:
+        batch_op.create_index('ix_card_deck_id_created_at_id', ['deck_id', 'created_at', 'id'], unique=False)
+
+    with op.batch_alter_table('drawn_card', schema=None) as batch_op:
+        batch_op.create_index('ix_drawn_card_card_id', ['card_id'], unique=True)
+        batch_op.create_index('ix_drawn_card_undrawn', ['card_id'], unique=False,
+                              postgresql_where=sa.text('NOT is_drawn'))
+
+
+def downgrade():
+    with op.batch_alter_table('drawn_card', schema=None) as batch_op:
+        batch_op.drop_index('ix_drawn_card_undrawn')
+        batch_op.drop_index('ix_drawn_card_card_id')
+
+    with op.batch_alter_table('card', schema=None) as batch_op:
+        batch_op.drop_index('ix_card_deck_id_created_at_id')
@@ -1,6 +1,7 @@
 from app import create_app, db
 from app.models import Card, Deck, DrawnCard, DeckCategory
 from faker import Faker
+from sqlalchemy import text
 import uuid
 
 app = create_app()
@@ -10,6 +11,8 @@ with app.app_context():
     print('Seeding the database...')
     print('Dropping and recreating all tables...')
     db.drop_all()
+    db.session.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    db.session.commit()
     db.create_all()
 
     categories = list(DeckCategory)
@@ -31,7 +34,7 @@ with app.app_context():
         drawn_cards = []
         for _ in range(10):
             card = Card(id=uuid.uuid4(), front=fake.sentence(nb_words=5), back=fake.sentence(nb_words=10), deck_id=deck.id)
-            drawn_card = DrawnCard(card_id=card.id, is_drawn=False)
+            drawn_card = DrawnCard(card_id=card.id, deck_id=deck.id, is_drawn=False)
 
             cards.append(card)
             drawn_cards.append(drawn_card)